@@ -0,0 +1,107 @@
+"""
+봇을 여러 워커 프로세스로 실행한다. 각 워커는 전체 샤드 중 연속된 범위를 맡는다.
+    CLUSTER_COUNT=4 python cluster.py
+워커들은 같은 lostark.db(WAL)를 쓰고, 백그라운드 폴러는 bot_state 리스로 하나만 돌린다.
+
+메모리 캐시/인덱스는 워커마다 따로 있고, 다른 워커에서 바뀐 내용은 바로 반영되지 않는다.
+- 떠상 구독: 알림을 보내는 리더가 매 폴링마다 구독 버전을 확인하고 바뀐 구독만 다시 읽는다.
+- /내원정대 캐시: 다른 워커(원정대 갱신 배치 포함)에서 바뀐 원정대는
+  SAVED_EXPEDITION_CACHE_TTL이 지날 때까지 예전 내용이 보일 수 있다.
+- 레이드 카탈로그/모집 목록: /레이드목록을 실행할 때와 RAID_STATE_SYNC_INTERVAL마다
+  버전을 확인해 바뀐 내용을 읽는다. 주간 골드 보상표는 카탈로그가 바뀌면 다시 만든다.
+- 캐릭터명 자동완성: 워커가 시작할 때 DB에서 읽고, 이후에는 자기 워커의 등록만 반영한다.
+- 모집 마감 스케줄: 워커가 시작할 때 읽은 모집과 자기 워커에서 만들거나 바꾼 모집만 마감한다.
+  다른 워커가 만든 모집은 그 워커가 마감한다.
+"""
+
+import asyncio
+import contextlib
+import os
+import signal
+import sys
+
+import discord
+
+from utils.config import settings
+from utils.database import db
+from utils.logger_config import logger
+
+logger = logger.getChild("cluster")
+
+
+async def recommended_shard_count() -> int:
+    http = discord.http.HTTPClient(asyncio.get_running_loop())
+    try:
+        await http.static_login(settings.DISCORD_BOT_TOKEN)
+        shards, _ = await http.get_bot_gateway()
+        return shards
+    finally:
+        await http.close()
+
+
+async def run_worker(
+    cluster_id: int, cluster_count: int, shard_count: int, stopping: asyncio.Event
+):
+    """워커 프로세스 하나를 띄우고, 종료 요청 전까지는 죽으면 다시 띄운다."""
+    env = {
+        **os.environ,
+        "BOT_SHARDED": "true",
+        "SHARD_COUNT": str(shard_count),
+        "CLUSTER_COUNT": str(cluster_count),
+        "CLUSTER_ID": str(cluster_id),
+    }
+    main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    while not stopping.is_set():
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, main_path, env=env
+        )
+        logger.info(f"Started worker {cluster_id} (pid {process.pid})")
+        stop_wait = asyncio.create_task(stopping.wait())
+        exit_wait = asyncio.create_task(process.wait())
+        await asyncio.wait({stop_wait, exit_wait}, return_when=asyncio.FIRST_COMPLETED)
+        if stopping.is_set():
+            # Ctrl+C는 워커에도 전달되므로 이미 끝났을 수 있다.
+            with contextlib.suppress(ProcessLookupError):
+                process.terminate()
+            await exit_wait
+            break
+        stop_wait.cancel()
+        logger.warning(
+            f"Worker {cluster_id} exited with {process.returncode}, "
+            f"restarting in {settings.CLUSTER_RESTART_DELAY}s"
+        )
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(stopping.wait(), settings.CLUSTER_RESTART_DELAY)
+    logger.info(f"Worker {cluster_id} stopped")
+
+
+async def main():
+    # 워커들이 동시에 마이그레이션하지 않도록 스키마는 런처가 먼저 준비한다.
+    await db.create_all()
+    db.dispose()
+
+    shard_count = settings.SHARD_COUNT or await recommended_shard_count()
+    # 워커마다 샤드가 하나 이상 있어야 한다. (빈 범위의 워커는 모든 샤드에 연결해 버린다)
+    cluster_count = min(settings.CLUSTER_COUNT, shard_count)
+    if cluster_count < settings.CLUSTER_COUNT:
+        logger.warning(
+            f"CLUSTER_COUNT={settings.CLUSTER_COUNT} exceeds {shard_count} shards, "
+            f"using {cluster_count} workers"
+        )
+    logger.info(f"Launching {cluster_count} workers for {shard_count} shards")
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    await asyncio.gather(
+        *(
+            run_worker(i, cluster_count, shard_count, stopping)
+            for i in range(cluster_count)
+        )
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,94 +1,201 @@
-import logging
-import os
+import hashlib
+import re
+from typing import Optional
+
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands, Embed, Color
-from discord.ui import View, Button
+from discord.ui import Button, DynamicItem, View
+from discord.utils import MISSING
 
 from schemas.user import DiscordUserSchema
 from schemas.expedition import ExpeditionSchema
+from repositories.expedition_repository import ExpeditionRepository
 from service.expedition import ExpeditionService
-from utils.database import Database
+from service.roster_refresh import RosterRefreshService
+from utils.cache import TTLCache
+from utils.config import settings
+from utils.database import db
 from utils.logger_config import logger
 
 logger = logger.getChild("cogs.expedition")
 
+SAVED_EXPEDITIONS_MESSAGE = "저장된 원정대 정보 조회 완료"
+
+# 페이지 버튼 custom_id의 조회 대상 종류
+SEARCH = "s"  # 원정대검색 결과: key = 캐릭터명
+SAVED = "u"  # 내원정대: key = discord_id
+
+
+# 같은 내용의 원정대는 다시 그리지 않도록 embed를 dict 형태로 보관한다.
+_embed_cache = TTLCache(
+    max_entries=settings.EXPEDITION_EMBED_CACHE_MAX_ENTRIES,
+    max_bytes=settings.EXPEDITION_EMBED_CACHE_MAX_BYTES,
+)
+
+
+class ExpeditionPageButton(
+    DynamicItem[Button],
+    template=r"exp:(?P<kind>[su]):(?P<key>[^:]+):(?P<page>\d+)",
+):
+    """
+    원정대 페이지 이동 버튼.
+    상태(조회 대상, 이동할 페이지)를 custom_id에 담아 두고, 누를 때마다
+    캐시/DB에서 원정대를 다시 불러와 그린다. 메시지별 View를 메모리에 두지 않으며
+    재시작 후에도 그대로 동작한다.
+    """
+
+    def __init__(self, kind: str, key: str, page: int, label: str, disabled: bool):
+        super().__init__(
+            Button(
+                label=label,
+                style=discord.ButtonStyle.gray,
+                custom_id=f"exp:{kind}:{key}:{page}",
+                disabled=disabled,
+            )
+        )
+        self.kind = kind
+        self.key = key
+        self.page = page
 
-class ExpeditionNavigator(View):
-    def __init__(self, embeds: list[Embed]):
-        super().__init__(timeout=None)
-        self.embeds = embeds
-        self.index = 0
-        self.update_buttons()
+    @classmethod
+    async def from_custom_id(
+        cls, interaction: discord.Interaction, item: Button, match: re.Match[str]
+    ):
+        return cls(
+            match["kind"], match["key"], int(match["page"]), item.label, item.disabled
+        )
 
-    def update_buttons(self):
-        self.prev_button.disabled = self.index == 0
-        self.next_button.disabled = self.index == len(self.embeds) - 1
+    async def callback(self, interaction: discord.Interaction):
+        if self.kind == SAVED:
+            if interaction.user.id != int(self.key):
+                await interaction.response.send_message(
+                    "본인의 원정대만 확인할 수 있습니다.", ephemeral=True
+                )
+                return
+            msg = SAVED_EXPEDITIONS_MESSAGE
+            expeditions = await ExpeditionRepository(db).get_expeditions(int(self.key))
+        else:
+            # 조회 결과는 API 캐시에서 오지만, 만료된 경우를 대비해 먼저 응답을 미룬다.
+            await interaction.response.defer()
+            msg, expeditions = await ExpeditionService().fetch_expeditions(self.key)
 
-    @discord.ui.button(label="이전", style=discord.ButtonStyle.gray)
-    async def prev_button(self, interaction: discord.Interaction, button: Button):
-        self.index -= 1
-        self.update_buttons()
-        await interaction.response.edit_message(
-            embed=self.embeds[self.index], view=self
-        )
+        if not expeditions:
+            text = "원정대 정보를 더 이상 불러올 수 없습니다."
+            if interaction.response.is_done():
+                await interaction.followup.send(text, ephemeral=True)
+            else:
+                await interaction.response.send_message(text, ephemeral=True)
+            return
 
-    @discord.ui.button(label="다음", style=discord.ButtonStyle.gray)
-    async def next_button(self, interaction: discord.Interaction, button: Button):
-        self.index += 1
-        self.update_buttons()
-        await interaction.response.edit_message(
-            embed=self.embeds[self.index], view=self
+        embed, view = build_expedition_message(
+            msg, expeditions, self.kind, self.key, self.page
         )
+        if interaction.response.is_done():
+            await interaction.edit_original_response(embed=embed, view=view)
+        else:
+            await interaction.response.edit_message(embed=embed, view=view)
 
 
-def format_expeditions_to_embeds(
-    msg: str, expeditions: list[ExpeditionSchema]
-) -> list[Embed]:
-    """ExpeditionSchema 리스트를 Embed 리스트로 변환하는 공용 함수."""
-    embeds = []
-    for exp in expeditions:
-        embed = Embed(
-            title=f"**{exp.server_name}** 원정대 정보",
-            description=f"> {msg}\n",
-            color=Color.blue(),
+def expedition_page_view(kind: str, key: str, page: int, total: int) -> View:
+    """page를 보여줄 때 붙일 이전/다음 버튼 뷰."""
+    view = View(timeout=None)
+    view.add_item(ExpeditionPageButton(kind, key, max(page - 1, 0), "이전", page == 0))
+    view.add_item(
+        ExpeditionPageButton(
+            kind, key, min(page + 1, total - 1), "다음", page == total - 1
         )
-        # 대표 캐릭터 이미지
-        if exp.character_image:
-            embed.set_thumbnail(url=exp.character_image)
+    )
+    return view
 
-        # 원정대 레벨 정보
-        embed.add_field(
-            name="원정대 레벨", value=f"**{exp.expedition_level}**", inline=True
-        )
-        embed.add_field(name="서버", value=f"**{exp.server_name}**", inline=True)
-
-        # 캐릭터 목록 정리
-        chars_info_lines = []
-        for char in exp.characters:
-            main_char_label = "⭐" if char.main_character else ""
-            chars_info_lines.append(
-                f"{main_char_label} **{char.character_name}**\n"
-                f"└ {char.character_class}, {char.item_level} \n"
-            )
 
-        if chars_info_lines:
-            chars_info = "\n".join(chars_info_lines)
-        else:
-            chars_info = "등록된 캐릭터가 없습니다."
+def _content_hash(msg: str, exp: ExpeditionSchema) -> str:
+    digest = hashlib.sha1(msg.encode("utf-8"))
+    digest.update(exp.model_dump_json().encode("utf-8"))
+    return digest.hexdigest()
+
+
+def render_expedition_embed(msg: str, exp: ExpeditionSchema) -> Embed:
+    """ExpeditionSchema 하나를 Embed로 변환한다. 같은 내용이면 캐시된 결과를 사용한다."""
+    key = _content_hash(msg, exp)
+    cached = _embed_cache.get(key)
+    if cached is not None:
+        return Embed.from_dict(cached)
 
-        # 캐릭터 정보 필드 추가
-        embed.add_field(name="캐릭터 목록", value=chars_info, inline=False)
+    embed = Embed(
+        title=f"**{exp.server_name}** 원정대 정보",
+        description=f"> {msg}\n",
+        color=Color.blue(),
+    )
+    # 대표 캐릭터 이미지
+    if exp.character_image:
+        embed.set_thumbnail(url=exp.character_image)
+
+    # 원정대 레벨 정보
+    embed.add_field(
+        name="원정대 레벨", value=f"**{exp.expedition_level}**", inline=True
+    )
+    embed.add_field(name="서버", value=f"**{exp.server_name}**", inline=True)
+
+    # 캐릭터 목록 정리
+    chars_info = "\n".join(
+        f"{'⭐' if char.main_character else ''} **{char.character_name}**\n"
+        f"└ {char.character_class}, {char.item_level} \n"
+        for char in exp.characters
+    )
+    embed.add_field(
+        name="캐릭터 목록",
+        value=chars_info or "등록된 캐릭터가 없습니다.",
+        inline=False,
+    )
 
-        embeds.append(embed)
+    _embed_cache.set(key, embed.to_dict(), settings.EXPEDITION_EMBED_CACHE_TTL)
+    return embed
 
-    return embeds
+
+def build_expedition_message(
+    msg: str,
+    expeditions: list[ExpeditionSchema],
+    kind: str,
+    key: str,
+    page: int = 0,
+) -> tuple[Embed, Optional[View]]:
+    """page번째 embed와 (서버가 여러 개면) 페이지 이동 뷰를 반환한다."""
+    page = min(page, len(expeditions) - 1)
+    embed = render_expedition_embed(msg, expeditions[page])
+    if len(expeditions) > 1:
+        return embed, expedition_page_view(kind, key, page, len(expeditions))
+    return embed, None
 
 
 class ExpeditionCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.db = Database()
+        self.db = db
+        self.expedition_repository = ExpeditionRepository(self.db)
+        self.roster_refresh = RosterRefreshService()
+
+    async def cog_load(self):
+        self.bot.add_dynamic_items(ExpeditionPageButton)
+        await self.expedition_repository.load_character_names()
+        if settings.ROSTER_REFRESH_ENABLED:
+            self.refresh_rosters.start()
+
+    async def cog_unload(self):
+        self.bot.remove_dynamic_items(ExpeditionPageButton)
+        self.refresh_rosters.cancel()
+
+    @tasks.loop(seconds=settings.ROSTER_REFRESH_INTERVAL)
+    async def refresh_rosters(self):
+        """오래된 원정대 정보를 배치 단위로 갱신한다."""
+        try:
+            await self.roster_refresh.run_batch()
+        except Exception:
+            logger.exception("Roster refresh batch failed")
+
+    @refresh_rosters.before_loop
+    async def before_refresh_rosters(self):
+        await self.bot.wait_until_ready()
 
     @app_commands.command(
         name="원정대검색",
@@ -105,7 +212,7 @@ class ExpeditionCog(commands.Cog):
         try:
             async with interaction.channel.typing():
                 # register=False 로 호출하면 검색 결과를 반환
-                msg, expeditions = ExpeditionService().get_and_save_expedition(
+                msg, expeditions = await ExpeditionService().get_and_save_expedition(
                     DiscordUserSchema(
                         discord_id=interaction.user.id,
                         discord_name=interaction.user.display_name,
@@ -123,18 +230,15 @@ class ExpeditionCog(commands.Cog):
                     await interaction.followup.send(msg, ephemeral=False)
                     return
 
-                embeds = format_expeditions_to_embeds(msg, expeditions)
-
-                if len(embeds) > 1:
-                    view = ExpeditionNavigator(embeds)
-                    await interaction.followup.send(
-                        embed=embeds[0], view=view, ephemeral=False
-                    )
-                else:
-                    await interaction.followup.send(embed=embeds[0], ephemeral=False)
+                embed, view = build_expedition_message(
+                    msg, expeditions, SEARCH, character_name
+                )
+                await interaction.followup.send(
+                    embed=embed, view=view or MISSING, ephemeral=False
+                )
         except discord.Forbidden:
             # 타이핑 표시 권한이 없을 경우 바로 메시지 전송
-            msg, expeditions = ExpeditionService().get_and_save_expedition(
+            msg, expeditions = await ExpeditionService().get_and_save_expedition(
                 DiscordUserSchema(
                     discord_id=interaction.user.id,
                     discord_name=interaction.user.display_name,
@@ -152,15 +256,12 @@ class ExpeditionCog(commands.Cog):
                 await interaction.followup.send(msg, ephemeral=False)
                 return
 
-            embeds = format_expeditions_to_embeds(msg, expeditions)
-
-            if len(embeds) > 1:
-                view = ExpeditionNavigator(embeds)
-                await interaction.followup.send(
-                    embed=embeds[0], view=view, ephemeral=False
-                )
-            else:
-                await interaction.followup.send(embed=embeds[0], ephemeral=False)
+            embed, view = build_expedition_message(
+                msg, expeditions, SEARCH, character_name
+            )
+            await interaction.followup.send(
+                embed=embed, view=view or MISSING, ephemeral=False
+            )
 
     @app_commands.command(
         name="원정대등록",
@@ -172,12 +273,17 @@ class ExpeditionCog(commands.Cog):
         # 등록은 본인만 볼 수 있게 ephemeral=True
         process_message = f"{character_name} : 원정대 정보를 등록/갱신중..."
         await interaction.response.send_message(process_message, ephemeral=True)
+        if interaction.guild is not None:
+            # 서버별 골드 순위(/골드순위)에 포함되도록 서버를 기록한다.
+            await self.expedition_repository.add_guild_member(
+                interaction.guild.id, interaction.user.id
+            )
 
         # 타이핑 표시 시도
         try:
             async with interaction.channel.typing():
                 # register=True 로 호출하면 저장만 수행 후 메시지 반환
-                msg, expeditions = ExpeditionService().get_and_save_expedition(
+                msg, expeditions = await ExpeditionService().get_and_save_expedition(
                     DiscordUserSchema(
                         discord_id=interaction.user.id,
                         discord_name=interaction.user.display_name,
@@ -195,7 +301,7 @@ class ExpeditionCog(commands.Cog):
                 )
         except discord.Forbidden:
             # 타이핑 표시 권한이 없을 경우 바로 메시지 전송
-            msg, expeditions = ExpeditionService().get_and_save_expedition(
+            msg, expeditions = await ExpeditionService().get_and_save_expedition(
                 DiscordUserSchema(
                     discord_id=interaction.user.id,
                     discord_name=interaction.user.display_name,
@@ -212,6 +318,17 @@ class ExpeditionCog(commands.Cog):
                 f"원정대 정보가 등록되었습니다. ({msg})", ephemeral=True
             )
 
+    @search_expedition.autocomplete("character_name")
+    @register_expedition.autocomplete("character_name")
+    async def character_name_autocomplete(
+        self, interaction: discord.Interaction, current: str
+    ) -> list[app_commands.Choice[str]]:
+        # 저장된 캐릭터명(본인 캐릭터 우선). 초성(예: ㅎㄱㄷ)으로도 찾을 수 있다.
+        names = self.expedition_repository.search_character_names(
+            current, interaction.user.id
+        )
+        return [app_commands.Choice(name=name, value=name) for name in names]
+
     @app_commands.command(
         name="내원정대",
         description="DB에 저장된 나의 원정대 정보를 확인합니다. (본인만 확인 가능)",
@@ -219,7 +336,9 @@ class ExpeditionCog(commands.Cog):
     async def my_expeditions(self, interaction: discord.Interaction):
         # 내원정대 정보는 본인만 확인 가능하므로 ephemeral=True
         logger.info(f"Fetching saved expeditions for user {interaction.user.id}")
-        expeditions = self.db.get_expeditions(interaction.user.id)
+        expeditions = await self.expedition_repository.get_expeditions(
+            interaction.user.id
+        )
 
         if not expeditions:
             logger.info("No saved expeditions found")
@@ -228,16 +347,12 @@ class ExpeditionCog(commands.Cog):
             )
             return
 
-        msg = "저장된 원정대 정보 조회 완료"
-        embeds = format_expeditions_to_embeds(msg, expeditions)
-
-        if len(embeds) > 1:
-            view = ExpeditionNavigator(embeds)
-            await interaction.response.send_message(
-                embed=embeds[0], view=view, ephemeral=True
-            )
-        else:
-            await interaction.response.send_message(embed=embeds[0], ephemeral=True)
+        embed, view = build_expedition_message(
+            SAVED_EXPEDITIONS_MESSAGE, expeditions, SAVED, str(interaction.user.id)
+        )
+        await interaction.response.send_message(
+            embed=embed, view=view or MISSING, ephemeral=True
+        )
 
 
 async def setup(bot: commands.Bot):
@@ -1,61 +1,341 @@
+import asyncio
 import logging
-import os
+import re
+from datetime import datetime, timedelta
+from typing import Optional
+
 import discord
-from discord.ext import commands
-from discord import app_commands
-from utils.database import Database
+from discord.ext import commands, tasks
+from discord import app_commands, Color, Embed
+from discord.ui import Button, DynamicItem, View
+from models.raid import RaidRecruitment, RaidType
+from repositories.expedition_repository import ExpeditionRepository
+from repositories.raid_repository import JoinResult, RaidRepository
+from schemas.raid import RaidRosterSchema
+from service.recruitment_index import RecruitmentEntry, recruitment_index
+from service.raid_catalog import raid_catalog
+from service.weekly_gold import WeeklyGoldService
+from utils.coalescer import EditCoalescer
+from utils.config import settings
+from utils.database import db
+from utils.deadline import DeadlineScheduler
 
 logger = logging.getLogger(__name__)
 
+JOIN_FAILURE_MESSAGES = {
+    JoinResult.ALREADY_JOINED: "이미 참가한 상태입니다.",
+    JoinResult.FULL: "모집 인원이 가득 찼습니다.",
+    JoinResult.CLOSED: "모집이 마감된 레이드입니다.",
+    JoinResult.NOT_FOUND: "존재하지 않는 레이드입니다.",
+    JoinResult.NO_CHARACTER: "등록된 캐릭터가 없습니다. /원정대등록 후 다시 시도해주세요.",
+    JoinResult.ITEM_LEVEL_TOO_LOW: "참가 가능한 아이템 레벨을 만족하는 캐릭터가 없습니다.",
+}
 
-class RaidControlView(discord.ui.View):
-    def __init__(self, db: Database, raid_id: int):
-        super().__init__(timeout=None)
-        self.db = db
+# 임베드 필드 값의 최대 길이
+FIELD_LIMIT = 1024
+# 골드 순위에 표시할 인원
+GOLD_REPORT_SIZE = 20
+
+
+def render_roster_embed(roster: RaidRosterSchema) -> Embed:
+    """모집 정보와 참가자 목록 임베드."""
+    raid_type = raid_catalog.current.types.get(roster.raid_type_id)
+    is_open = roster.status == "open"
+    count = len(roster.participants)
+    capacity = (
+        f"{count}/{roster.max_participants}" if roster.max_participants else f"{count}"
+    )
+    embed = Embed(
+        title=(
+            f"{raid_type.raid_name} ({raid_type.difficulty}) 참가자 모집"
+            if raid_type
+            else "레이드 참가자 모집"
+        )
+        + ("" if is_open else " (마감)"),
+        color=Color.green() if is_open else Color.dark_grey(),
+    )
+    details = []
+    if roster.min_item_level:
+        details.append(f"최소 아이템 레벨: **{roster.min_item_level}**")
+    if roster.end_time:
+        details.append(f"마감: **{roster.end_time.strftime('%m-%d %H:%M')}**")
+    if details:
+        embed.description = "\n".join(details)
+
+    lines, length = [], 0
+    for i, p in enumerate(roster.participants, 1):
+        line = f"{i}. **{p.character_name}** {p.character_class} {p.item_level}"
+        # 뒤에 붙을 "외 N명" 자리를 남겨 둔다.
+        if length + len(line) + 1 > FIELD_LIMIT - 16:
+            lines.append(f"외 {count - i + 1}명")
+            break
+        lines.append(line)
+        length += len(line) + 1
+    embed.add_field(
+        name=f"참가자 ({capacity})",
+        value="\n".join(lines) or "아직 참가자가 없습니다.",
+        inline=False,
+    )
+    return embed
+
+
+def _mark_recruitment_dirty(interaction: discord.Interaction, recruitment_id: int):
+    cog = interaction.client.get_cog(RaidCog.__cog_name__)
+    if cog is not None:
+        cog.roster_updates.mark_dirty(recruitment_id)
+
+
+class RaidJoinButton(DynamicItem[Button], template=r"raid:join:(?P<id>\d+)"):
+    """레이드 참가 버튼. 모집 id만 custom_id에 담고, 누를 때 DB에서 처리한다."""
+
+    def __init__(self, raid_id: int):
+        super().__init__(
+            Button(
+                label="참가",
+                style=discord.ButtonStyle.green,
+                custom_id=f"raid:join:{raid_id}",
+            )
+        )
         self.raid_id = raid_id
 
-    @discord.ui.button(label="참가", style=discord.ButtonStyle.green)
-    async def join_raid(
-        self, interaction: discord.Interaction, button: discord.ui.Button
+    @classmethod
+    async def from_custom_id(
+        cls, interaction: discord.Interaction, item: Button, match: re.Match[str]
     ):
-        success = self.db.add_participant(self.raid_id, interaction.user.id)
-        if success:
-            logger.info(f"{interaction.user} joined raid {self.raid_id}")
+        return cls(int(match["id"]))
+
+    async def callback(self, interaction: discord.Interaction):
+        result = await RaidRepository(db).add_participant(
+            self.raid_id, interaction.user.id
+        )
+        logger.info(f"{interaction.user} join raid {self.raid_id}: {result.value}")
+        if result is JoinResult.JOINED:
+            _mark_recruitment_dirty(interaction, self.raid_id)
             await interaction.response.send_message(
                 f"{interaction.user.mention}님이 레이드에 참가했습니다!", ephemeral=True
             )
         else:
-            logger.info(f"{interaction.user} already in raid {self.raid_id}")
             await interaction.response.send_message(
-                "이미 참가한 상태입니다.", ephemeral=True
+                JOIN_FAILURE_MESSAGES[result], ephemeral=True
             )
 
-    @discord.ui.button(label="취소", style=discord.ButtonStyle.red)
-    async def leave_raid(
-        self, interaction: discord.Interaction, button: discord.ui.Button
+
+class RaidLeaveButton(DynamicItem[Button], template=r"raid:leave:(?P<id>\d+)"):
+    """레이드 참가 취소 버튼."""
+
+    def __init__(self, raid_id: int):
+        super().__init__(
+            Button(
+                label="취소",
+                style=discord.ButtonStyle.red,
+                custom_id=f"raid:leave:{raid_id}",
+            )
+        )
+        self.raid_id = raid_id
+
+    @classmethod
+    async def from_custom_id(
+        cls, interaction: discord.Interaction, item: Button, match: re.Match[str]
     ):
-        self.db.remove_participant(self.raid_id, interaction.user.id)
+        return cls(int(match["id"]))
+
+    async def callback(self, interaction: discord.Interaction):
+        removed = await RaidRepository(db).remove_participant(
+            self.raid_id, interaction.user.id
+        )
+        if not removed:
+            await interaction.response.send_message(
+                "참가 중인 레이드가 아닙니다.", ephemeral=True
+            )
+            return
         logger.info(f"{interaction.user} left raid {self.raid_id}")
+        _mark_recruitment_dirty(interaction, self.raid_id)
         await interaction.response.send_message(
             f"{interaction.user.mention}님이 레이드 참가를 취소했습니다.",
             ephemeral=True,
         )
 
 
+def raid_control_view(raid_id: int, disabled: bool = False) -> View:
+    """
+    참가/취소 버튼 뷰. 버튼은 DynamicItem이라 메시지별 View가 메모리에 남지 않고,
+    봇이 재시작되어도 add_dynamic_items로 등록된 핸들러가 그대로 처리한다.
+    마감된 모집은 disabled=True로 버튼을 비활성화해서 보여준다.
+    """
+    view = View(timeout=None)
+    for item in (RaidJoinButton(raid_id), RaidLeaveButton(raid_id)):
+        item.item.disabled = disabled
+        view.add_item(item)
+    return view
+
+
 class RaidCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.db = Database()
+        self.db = db
+        self.raid_repository = RaidRepository(self.db)
+        self.expedition_repository = ExpeditionRepository(self.db)
+        self.raid_catalog = raid_catalog
+        self.recruitment_index = recruitment_index
+        self.weekly_gold_service = WeeklyGoldService()
+        # 참가/취소가 몰려도 참가자 목록 메시지는 window초에 한 번만 수정한다.
+        self.roster_updates = EditCoalescer(
+            settings.RAID_ROSTER_EDIT_WINDOW, self.sync_recruitment
+        )
+        # 마감 시각이 된 모집을 닫는다. 다음 마감까지는 잠들어 있으므로 주기적인 조회가 없다.
+        self.deadlines = DeadlineScheduler(self.close_expired_recruitments)
+        # 카탈로그/모집 인덱스에 반영된 버전. 클러스터에서 다른 워커의 변경을 찾는 데 쓴다.
+        self.catalog_version = 0
+        self.recruitment_version = 0
+        self._sync_lock = asyncio.Lock()
+
+    async def cog_load(self):
+        self.bot.add_dynamic_items(RaidJoinButton, RaidLeaveButton)
+        await self.reload_shared_state()
+        self.deadlines.load(await self.raid_repository.list_deadlines())
+        self.deadlines.start()
+        if settings.CLUSTER_COUNT > 1:
+            self.sync_cluster_state.start()
+
+    async def cog_unload(self):
+        self.bot.remove_dynamic_items(RaidJoinButton, RaidLeaveButton)
+        self.sync_cluster_state.cancel()
+        await self.deadlines.close()
+        await self.roster_updates.close()
+
+    async def reload_shared_state(self):
+        """카탈로그와 모집 인덱스를 DB에서 통째로 다시 읽는다."""
+        # 버전을 먼저 읽어, 읽는 도중 바뀐 내용은 다음 동기화 때 다시 반영되게 한다.
+        versions = await self.raid_repository.current_versions()
+        await self.raid_catalog.reload()
+        await self.load_recruitment_index()
+        self.catalog_version, self.recruitment_version = versions
+
+    async def sync_shared_state(self):
+        """
+        다른 워커에서 바뀐 카탈로그/모집을 반영한다. 버전이 그대로면 카운터만 읽고 끝난다.
+        카탈로그가 바뀌면 전부 다시 읽고, 모집만 바뀌면 바뀐 모집만 인덱스에 반영한다.
+        """
+        if settings.CLUSTER_COUNT <= 1:
+            return
+        async with self._sync_lock:
+            catalog_version, recruitment_version = (
+                await self.raid_repository.current_versions()
+            )
+            if catalog_version != self.catalog_version:
+                await self.reload_shared_state()
+                return
+            if recruitment_version == self.recruitment_version:
+                return
+            rows = await self.raid_repository.list_changed_recruitments(
+                self.recruitment_version
+            )
+            for row in rows:
+                entry = (
+                    self._index_entry(row)
+                    if row.status == RaidRecruitment.RecruitmentStatus.OPEN
+                    and not row.is_deleted
+                    else None
+                )
+                if entry is None:
+                    self.recruitment_index.remove(row.id)
+                else:
+                    self.recruitment_index.upsert(entry)
+            self.recruitment_version = recruitment_version
+
+    @tasks.loop(seconds=settings.RAID_STATE_SYNC_INTERVAL)
+    async def sync_cluster_state(self):
+        try:
+            await self.sync_shared_state()
+        except Exception:
+            logger.exception("Failed to sync raid state from other workers")
+
+    def _index_entry(self, row) -> Optional[RecruitmentEntry]:
+        raid_type = self.raid_catalog.current.types.get(row.raid_type_id)
+        if raid_type is None:
+            return None
+        return RecruitmentEntry.from_row(row, raid_type)
+
+    async def load_recruitment_index(self):
+        rows = await self.raid_repository.list_open_recruitments()
+        self.recruitment_index.load(
+            entry for entry in map(self._index_entry, rows) if entry is not None
+        )
+
+    async def refresh_recruitment_index(self, recruitment_id: int):
+        """모집 한 건의 목록 인덱스 항목을 DB 상태에 맞춘다."""
+        row = await self.raid_repository.get_open_recruitment(recruitment_id)
+        entry = self._index_entry(row) if row is not None else None
+        if entry is None:
+            self.recruitment_index.remove(recruitment_id)
+        else:
+            self.recruitment_index.upsert(entry)
+
+    async def sync_recruitment(self, recruitment_id: int):
+        """참가자 변경을 목록 인덱스와 모집 메시지에 반영한다. (EditCoalescer flush)"""
+        await self.refresh_recruitment_index(recruitment_id)
+        await self.edit_roster_message(recruitment_id)
+
+    async def close_expired_recruitments(self, recruitment_ids: list[int]):
+        """마감 시각이 지난 모집을 한 번에 마감하고 목록/메시지에 반영한다. (DeadlineScheduler)"""
+        closed = await self.raid_repository.close_expired(
+            recruitment_ids, datetime.now()
+        )
+        logger.info(f"Closed {len(closed)} expired recruitments: {closed}")
+        for recruitment_id in closed:
+            self.recruitment_index.remove(recruitment_id)
+            self.roster_updates.mark_dirty(recruitment_id)
+
+    async def edit_roster_message(self, recruitment_id: int):
+        """모집 메시지를 현재 참가자 목록으로 다시 그린다."""
+        roster = await self.raid_repository.get_roster(recruitment_id)
+        if roster is None or roster.message_id is None:
+            return
+        try:
+            channel = self.bot.get_channel(
+                roster.channel_id
+            ) or await self.bot.fetch_channel(roster.channel_id)
+            await channel.get_partial_message(roster.message_id).edit(
+                embed=render_roster_embed(roster),
+                view=raid_control_view(
+                    recruitment_id, disabled=roster.status != "open"
+                ),
+            )
+        except discord.NotFound:
+            logger.info(f"Roster message for raid {recruitment_id} no longer exists")
 
     @app_commands.command(name="레이드추가", description="새로운 레이드를 추가합니다.")
-    async def add_raid(self, interaction: discord.Interaction, name: str, gold: int):
+    @app_commands.describe(min_item_level="입장 가능 아이템 레벨")
+    async def add_raid(
+        self,
+        interaction: discord.Interaction,
+        name: str,
+        gold: int,
+        min_item_level: Optional[int] = None,
+    ):
         logger.info(f"Attempting to add raid {name} with gold {gold}")
-        raid_id = self.db.add_raid(name, gold)
+        # 카탈로그에 있는 레이드는 DB까지 가지 않고 바로 거절한다.
+        raid_id = (
+            None
+            if self.raid_catalog.current.get_raid(name)
+            else await self.raid_repository.add_raid(
+                name, gold, min_item_level, interaction.guild_id
+            )
+        )
         if raid_id:
-            view = RaidControlView(self.db, raid_id)
+            await self.raid_catalog.reload()
+            view = raid_control_view(raid_id)
             logger.info(f"Raid {name} ({raid_id}) added successfully.")
+            await self.refresh_recruitment_index(raid_id)
+            roster = await self.raid_repository.get_roster(raid_id)
             await interaction.response.send_message(
-                f"레이드 **{name}**가 추가되었습니다!", view=view
+                f"레이드 **{name}**가 추가되었습니다!",
+                embed=render_roster_embed(roster),
+                view=view,
+            )
+            message = await interaction.original_response()
+            await self.raid_repository.set_message(
+                raid_id, message.channel.id, message.id
             )
         else:
             logger.warning(f"Raid {name} already exists.")
@@ -63,20 +343,214 @@ class RaidCog(commands.Cog):
                 f"레이드 **{name}**는 이미 존재합니다.", ephemeral=True
             )
 
+    @app_commands.command(
+        name="레이드마감", description="레이드 모집 마감 시각을 설정합니다. (관리자)"
+    )
+    @app_commands.guild_only()
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.describe(
+        raid_id="모집 번호", minutes="지금부터 몇 분 뒤에 마감할지 (0이면 바로 마감)"
+    )
+    async def set_raid_deadline(
+        self,
+        interaction: discord.Interaction,
+        raid_id: int,
+        minutes: app_commands.Range[int, 0, 7 * 24 * 60],
+    ):
+        # 관리자라도 다른 서버에 올라간 모집은 건드리지 못한다.
+        # 서버를 모르는 모집(guild_id 추가 전에 만든 모집)은 메시지 채널의 서버로 판단하고,
+        # 그것도 알 수 없으면 거절한다.
+        roster = await self.raid_repository.get_roster(raid_id)
+        guild_id = roster.guild_id if roster is not None else None
+        if guild_id is None and roster is not None and roster.channel_id is not None:
+            channel = self.bot.get_channel(roster.channel_id)
+            guild_id = getattr(getattr(channel, "guild", None), "id", None)
+        if guild_id is None or guild_id != interaction.guild_id:
+            await interaction.response.send_message(
+                "이 서버의 레이드 모집이 아닙니다.", ephemeral=True
+            )
+            return
+
+        end_time = datetime.now() + timedelta(minutes=minutes)
+        if not await self.raid_repository.set_end_time(raid_id, end_time):
+            await interaction.response.send_message(
+                "모집 중인 레이드가 아닙니다.", ephemeral=True
+            )
+            return
+        logger.info(f"{interaction.user} set deadline of raid {raid_id} to {end_time}")
+        self.deadlines.schedule(raid_id, end_time)
+        self.roster_updates.mark_dirty(raid_id)
+        await interaction.response.send_message(
+            f"`#{raid_id}` 모집이 {end_time.strftime('%m-%d %H:%M')}에 마감됩니다.",
+            ephemeral=True,
+        )
+
     @app_commands.command(
         name="레이드목록", description="현재 참여 가능한 레이드 목록을 확인합니다."
     )
-    async def list_raids(self, interaction: discord.Interaction):
-        # raids = self.db.get_raids()
-        # if not raids:
-        #     logger.info("No active raids available.")
-        #     await interaction.response.send_message("현재 참여 가능한 레이드가 없습니다.", ephemeral=True)
-        #     return
-        #
-        # description = "\n".join([f"ID: {raid.id} | **{raid.name}** | 골드: {raid.gold} | 생성일: {raid.created_at}" for raid in raids])
-        # logger.info(f"Listed {len(raids)} raids.")
+    @app_commands.describe(raid="레이드 이름", difficulty="난이도")
+    @app_commands.choices(
+        difficulty=[
+            app_commands.Choice(name=level.value, value=level.value)
+            for level in RaidType.DifficultyLevel
+        ]
+    )
+    async def list_raids(
+        self,
+        interaction: discord.Interaction,
+        raid: Optional[str] = None,
+        difficulty: Optional[app_commands.Choice[str]] = None,
+    ):
+        await self.sync_shared_state()
+        # 저장된 원정대(캐시)에서 가장 높은 아이템 레벨을 기준으로 참가 가능한 모집만 보여준다.
+        expeditions = await self.expedition_repository.get_expeditions(
+            interaction.user.id
+        )
+        item_level = max(
+            (char.item_level for exp in expeditions for char in exp.characters),
+            default=0,
+        )
+        entries = self.recruitment_index.query(
+            item_level,
+            raid_name=raid.strip() if raid else None,
+            difficulty=difficulty.value if difficulty else None,
+            now=datetime.now(),
+        )
+        logger.info(
+            f"Listed {len(entries)} raids for {interaction.user.id} (ilvl {item_level})"
+        )
+        if not entries:
+            await interaction.response.send_message(
+                "현재 참여 가능한 레이드가 없습니다.", ephemeral=True
+            )
+            return
+
+        lines = []
+        for entry in entries:
+            line = f"`#{entry.id}` **{entry.raid_name}** ({entry.difficulty})"
+            if entry.min_item_level:
+                line += f" · {entry.min_item_level}+"
+            line += f" · {entry.participant_count}"
+            if entry.max_participants:
+                line += f"/{entry.max_participants}"
+            line += "명"
+            if entry.end_time:
+                line += f" · 마감 {entry.end_time.strftime('%m-%d %H:%M')}"
+            lines.append(line)
+
+        embed = Embed(
+            title="참여 가능한 레이드 목록",
+            description="\n".join(lines),
+            color=Color.blue(),
+        )
+        if item_level:
+            embed.set_footer(text=f"내 최고 아이템 레벨: {item_level}")
+        else:
+            embed.set_footer(
+                text="/원정대등록 후 아이템 레벨 조건이 있는 모집도 볼 수 있습니다."
+            )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    # /레이드추가는 카탈로그에 없는 새 이름만 받으므로 자동완성을 붙이지 않는다.
+    @list_raids.autocomplete("raid")
+    async def raid_name_autocomplete(
+        self, interaction: discord.Interaction, current: str
+    ) -> list[app_commands.Choice[str]]:
+        names = self.raid_catalog.current.names.search(current)
+        return [app_commands.Choice(name=name, value=name) for name in names]
+
+    @app_commands.command(
+        name="주간골드",
+        description="등록된 원정대로 얻을 수 있는 주간 최대 골드를 계산합니다.",
+    )
+    async def weekly_gold(self, interaction: discord.Interaction):
+        if interaction.guild is not None:
+            await self.expedition_repository.add_guild_member(
+                interaction.guild.id, interaction.user.id
+            )
+        roster = await self.weekly_gold_service.get_roster_gold(interaction.user.id)
+        if roster is None:
+            await interaction.response.send_message(
+                "등록된 원정대가 없습니다. /원정대등록 후 다시 시도해주세요.",
+                ephemeral=True,
+            )
+            return
+
+        table = self.weekly_gold_service.get_table()
+        embed = Embed(
+            title="주간 최대 골드",
+            description=f"합계: **{roster.total:,}** 골드",
+            color=Color.gold(),
+        )
+        for char in roster.characters:
+            raids = " · ".join(
+                f"{r.raid_name}({r.difficulty}) {r.gold:,}"
+                for r in table.raids_for(char.item_level)
+            )
+            embed.add_field(
+                name=f"{char.character_name} ({char.item_level}) — {char.gold:,}",
+                value=raids or "입장 가능한 레이드가 없습니다.",
+                inline=False,
+            )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(
+        name="골드순위", description="서버 멤버들의 주간 최대 골드 순위를 확인합니다."
+    )
+    @app_commands.guild_only()
+    async def gold_report(self, interaction: discord.Interaction):
+        # 멤버 인텐트 없이도 이 서버에서 봇을 사용한 유저만 순위에 넣는다.
+        await self.expedition_repository.add_guild_member(
+            interaction.guild.id, interaction.user.id
+        )
+        rosters = await self.weekly_gold_service.get_report(interaction.guild.id)
+        if not rosters:
+            await interaction.response.send_message(
+                "이 서버에 등록된 원정대가 없습니다.", ephemeral=True
+            )
+            return
+
+        lines = [
+            f"{rank}. **{roster.discord_name}** — {roster.total:,}"
+            for rank, roster in enumerate(rosters[:GOLD_REPORT_SIZE], 1)
+        ]
+        embed = Embed(
+            title="주간 최대 골드 순위",
+            description="\n".join(lines),
+            color=Color.gold(),
+        )
+        my_rank = next(
+            (
+                rank
+                for rank, roster in enumerate(rosters, 1)
+                if roster.discord_id == interaction.user.id
+            ),
+            None,
+        )
+        footer = f"전체 {len(rosters)}명 · 합계 {sum(r.total for r in rosters):,} 골드"
+        if my_rank:
+            footer += f" · 내 순위 {my_rank}위"
+        embed.set_footer(text=footer)
+        await interaction.response.send_message(embed=embed)
+
+    @app_commands.command(
+        name="레이드정보갱신",
+        description="레이드/난이도/관문 정보를 DB에서 다시 불러옵니다. (관리자)",
+    )
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.checks.has_permissions(administrator=True)
+    async def reload_raid_catalog(self, interaction: discord.Interaction):
+        # 다른 워커도 카탈로그 버전이 바뀐 것을 보고 다시 읽는다.
+        await self.raid_repository.bump_catalog_version()
+        # 새 카탈로그의 레이드명/난이도로 목록 인덱스도 다시 만든다.
+        async with self._sync_lock:
+            await self.reload_shared_state()
+        catalog = self.raid_catalog.current
         await interaction.response.send_message(
-            f"**참여 가능한 레이드 목록**", ephemeral=True
+            f"레이드 정보를 다시 불러왔습니다. (레이드 {len(catalog.raids)}개, "
+            f"난이도 {len(catalog)}개)",
+            ephemeral=True,
         )
 
 
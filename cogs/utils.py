@@ -1,75 +1,132 @@
+import asyncio
+import time
+from typing import Optional
+
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands, Embed, Color
-import requests
-from datetime import datetime, time, timedelta
-from dateutil import parser as date_parser
-import pytz
+from repositories.merchant_subscription_repository import (
+    MerchantSubscriptionRepository,
+)
+from service.merchant import (
+    MerchantSnapshot,
+    get_interval_start,
+    merchant_poller,
+    now_kst,
+)
+from service.merchant_alert import (
+    ALL_CONTINENTS,
+    item_label,
+    merchant_alerts,
+    parse_item_query,
+)
+from utils.config import settings
+from utils.database import db
 from utils.logger_config import logger
+from utils.metrics import metrics
 
 logger = logger.getChild("cogs.utils")
 
+# /봇상태 각 필드에 보여줄 최대 줄 수
+STATUS_ROWS = 10
+
+
+def _histogram_lines(name: str, label: str) -> list[str]:
+    """label별 호출 수와 p50/p95(ms)를 호출 수가 많은 순으로."""
+    rows = sorted(metrics.histograms(name), key=lambda row: row[1].count, reverse=True)
+    return [
+        f"`{labels.get(label, '-')}` {h.count}회 · "
+        f"p50 {h.quantile(0.5) * 1000:.0f}ms · p95 {h.quantile(0.95) * 1000:.0f}ms"
+        for labels, h in rows[:STATUS_ROWS]
+    ]
+
 
 class UtilsCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.db = db
+        self.merchant_poller = merchant_poller
+        self.merchant_alerts = merchant_alerts
+        self.subscription_repository = MerchantSubscriptionRepository(self.db)
 
-    MERCHANT_INTERVALS = [
-        (time(22, 0), time(3, 30)),
-        (time(16, 0), time(21, 30)),
-        (time(10, 0), time(15, 30)),
-        (time(4, 0), time(9, 30)),
-    ]
+    async def cog_load(self):
+        # 버전을 먼저 읽어, 로드 도중 바뀐 구독은 다음 동기화 때 다시 반영되게 한다.
+        self.merchant_alerts.version = (
+            await self.subscription_repository.current_version()
+        )
+        self.merchant_alerts.load(await self.subscription_repository.list_active())
+        self.merchant_poller.add_listener(self.notify_merchant_subscribers)
+        self.merchant_poller.start()
+        if settings.METRICS_TEXTFILE:
+            self.write_metrics.start()
+
+    async def cog_unload(self):
+        self.merchant_poller.remove_listener(self.notify_merchant_subscribers)
+        await self.merchant_poller.stop()
+        self.write_metrics.cancel()
+
+    @tasks.loop(seconds=settings.METRICS_WRITE_INTERVAL)
+    async def write_metrics(self):
+        """지표를 Prometheus 텍스트 형식으로 METRICS_TEXTFILE에 쓴다."""
+        try:
+            await asyncio.to_thread(metrics.write_textfile, settings.METRICS_TEXTFILE)
+        except OSError as e:
+            logger.warning(
+                f"Failed to write metrics to {settings.METRICS_TEXTFILE}: {e}"
+            )
+
+    async def sync_subscriptions(self):
+        version = await self.subscription_repository.current_version()
+        if version == self.merchant_alerts.version:
+            return
+        rows = await self.subscription_repository.list_changed(
+            self.merchant_alerts.version
+        )
+        self.merchant_alerts.apply_changes(rows, version)
 
     def get_current_interval_start(self):
+        return get_interval_start(now_kst())
 
-        kst_tz = pytz.timezone("Asia/Seoul")
-        now = datetime.now(kst_tz)
-        current_time = now.time()
-
-        for start_t, end_t in self.MERCHANT_INTERVALS:
-            if start_t <= end_t:
-                if start_t <= current_time <= end_t:
-                    return datetime(
-                        now.year,
-                        now.month,
-                        now.day,
-                        start_t.hour,
-                        start_t.minute,
-                        start_t.second,
-                    )
-            else:
-                if current_time >= start_t or current_time <= end_t:
-                    start_date = now.date()
-                    if current_time <= end_t:
-                        start_date = (now - timedelta(days=1)).date()
-
-                    return datetime(
-                        start_date.year,
-                        start_date.month,
-                        start_date.day,
-                        start_t.hour,
-                        start_t.minute,
-                        start_t.second,
+    async def notify_merchant_subscribers(self, snapshot: MerchantSnapshot):
+        """새로 등록된 떠상 항목과 구독을 매칭해 채널 메시지/DM으로 알린다."""
+        # 구독 등록/해제는 명령을 받은 워커의 인덱스에만 바로 반영되므로,
+        # 알림을 보내는 리더는 매칭 전에 구독 버전을 보고 바뀐 구독만 다시 읽는다.
+        if self.merchant_poller.lease.enabled and self.merchant_poller.lease.held:
+            await self.sync_subscriptions()
+        alerts = self.merchant_alerts.collect(
+            snapshot.interval_start, snapshot.merchants
+        )
+        # 보낸 항목 기록은 모든 워커가 맞춰 두고, 실제 전송은 폴링 리더만 한다.
+        if not self.merchant_poller.lease.held:
+            return
+        for alert in alerts:
+            try:
+                if alert.channel_id is not None:
+                    target = self.bot.get_channel(
+                        alert.channel_id
+                    ) or await self.bot.fetch_channel(alert.channel_id)
+                else:
+                    target = self.bot.get_user(
+                        alert.discord_id
+                    ) or await self.bot.fetch_user(alert.discord_id)
+                for content in alert.messages():
+                    await target.send(
+                        content,
+                        allowed_mentions=discord.AllowedMentions(
+                            everyone=False, roles=False, users=True
+                        ),
                     )
-
-        return None
+            except discord.HTTPException as e:
+                logger.warning(
+                    f"Failed to send merchant alert "
+                    f"(channel={alert.channel_id}, user={alert.discord_id}): {e}"
+                )
 
     @app_commands.command(
         name="떠돌이상인", description="떠돌이상인 정보를 표시합니다."
     )
     async def show_wandering_merchant(self, interaction: discord.Interaction):
-        kloa_api_url = "https://api.korlark.com/merchants?limit=15&server=1"
-        response = requests.get(kloa_api_url)
-        if response.status_code != 200:
-            await interaction.response.send_message(
-                "떠돌이 상인 정보를 불러오는 데 실패했습니다.", ephemeral=True
-            )
-            return
-
-        data = response.json()
-        merchants = data.get("merchants", [])
-
+        # 백그라운드 폴러가 만든 스냅샷만 사용한다. (커맨드에서 외부 API 호출 없음)
         interval_start = self.get_current_interval_start()
         if interval_start is None:
             await interaction.response.send_message(
@@ -77,15 +134,15 @@ class UtilsCog(commands.Cog):
             )
             return
 
-        filtered_merchants = []
-        for m in merchants:
-            created_at_str = m.get("created_at")
-            if created_at_str:
-                created_time = date_parser.parse(created_at_str) + timedelta(hours=9)
-                if created_time >= interval_start:
-                    filtered_merchants.append(m)
+        snapshot = self.merchant_poller.snapshot
+        if snapshot is None:
+            await interaction.response.send_message(
+                "떠돌이 상인 정보를 불러오는 데 실패했습니다.", ephemeral=True
+            )
+            return
 
-        if not filtered_merchants:
+        # 시간대가 막 열려 아직 이번 시간대를 조회하기 전이면 등록된 떠상이 없는 것으로 본다.
+        if snapshot.interval_start != interval_start or not snapshot.fields:
             await interaction.response.send_message(
                 "현재 해당 시간대에 등록된 떠상이 없습니다.", ephemeral=True
             )
@@ -98,71 +155,165 @@ class UtilsCog(commands.Cog):
                 f"**시작 시각 (KST)**: {interval_start.strftime('%Y-%m-%d %H:%M')}"
             ),
             color=Color.green(),
-            timestamp=datetime.now(),
+            timestamp=snapshot.fetched_at,
         )
         embed.set_footer(text="출처: kloa.gg")
 
-        continent_map = {}
-
-        for m in filtered_merchants:
-            continent = m.get("continent", "알 수 없음")
-            items_data = m.get("items", [])
-
-            if continent not in continent_map:
-                continent_map[continent] = {
-                    "cards": [],
-                    "heroic_likes": [],
-                    "legendary_likes": [],
-                    "others": [],
-                }
-
-            for it in items_data:
-                it_type = it.get("type", "")
-                content = it.get("content", "")
-                logger.info(f"Item type: {it_type}")
-
-                if it_type == 0:  # 카드
-                    continent_map[continent]["cards"].append(f"**{content}**")
-                elif it_type == 1:  # 호감도
-                    if content == "0":
-                        continent_map[continent]["heroic_likes"].append("영웅 호감도")
-                    elif content == "1":
-                        continent_map[continent]["legendary_likes"].append(
-                            "**전설 호감도**"
-                        )
-                    else:
-                        continent_map[continent]["others"].append(f"**{content}**")
-                else:  # 기타
-                    continent_map[continent]["others"].append(f"**{content}**")
-
-        # 대륙별로 하나의 필드만 추가
-        for continent, items_dict in continent_map.items():
-            cards = list(set(items_dict["cards"]))
-            heroic = list(set(items_dict["heroic_likes"]))
-            legendary = list(set(items_dict["legendary_likes"]))
-            others = list(set(items_dict["others"]))
-
-            # 각 카테고리별 내용 정리
-            parts = []
-            if cards:
-                cards_str = "\n".join([f"• {c}" for c in cards])
-                parts.append(f"**[카드]**\n{cards_str}")
-            if heroic or legendary:
-                # 호감도 묶어서 표현
-                like_lines = []
-                if heroic:
-                    like_lines.extend([f"• {h}" for h in heroic])
-                if legendary:
-                    like_lines.extend([f"• {l}" for l in legendary])
-                if like_lines:
-                    parts.append(f"**[호감도]**\n" + "\n".join(like_lines))
-            if others:
-                others_str = "\n".join([f"• {o}" for o in others])
-                parts.append(f"**[기타 아이템]**\n{others_str}")
-
-            field_value = "\n\n".join(parts) if parts else "정보 없음"
-            embed.add_field(name=f"🌏 {continent}", value=field_value, inline=False)
+        for name, value in snapshot.fields:
+            embed.add_field(name=name, value=value, inline=False)
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(
+        name="상인알림등록",
+        description="떠돌이 상인에 원하는 아이템이 등장하면 알림을 받습니다.",
+    )
+    @app_commands.describe(
+        item="아이템 이름 (예: 전설 호감도, 카드 이름)",
+        continent="특정 대륙만 받으려면 대륙 이름 (비우면 전체 대륙)",
+        dm="이 채널 대신 DM으로 받기",
+    )
+    async def subscribe_merchant(
+        self,
+        interaction: discord.Interaction,
+        item: str,
+        continent: Optional[str] = None,
+        dm: bool = False,
+    ):
+        item_key = parse_item_query(item)
+        continent = continent.strip() if continent else ALL_CONTINENTS
+        # 서버 밖(DM)에서 등록하면 항상 DM으로 받는다.
+        channel_id = None if dm or interaction.guild is None else interaction.channel_id
+
+        row = await self.subscription_repository.subscribe(
+            interaction.user.id,
+            interaction.guild_id,
+            channel_id,
+            item_key,
+            continent,
+        )
+        self.merchant_alerts.index.add(row)
 
+        where = "DM" if channel_id is None else f"<#{channel_id}>"
+        await interaction.response.send_message(
+            f"**{item_label(item_key)}** ({continent or '전체 대륙'}) 알림을 "
+            f"{where}(으)로 보내드립니다.",
+            ephemeral=True,
+        )
+
+    @app_commands.command(
+        name="상인알림해제", description="떠돌이 상인 아이템 알림을 해제합니다."
+    )
+    @app_commands.describe(
+        item="등록한 아이템 이름",
+        continent="등록할 때 지정한 대륙 이름 (비우면 전체 대륙 구독)",
+    )
+    async def unsubscribe_merchant(
+        self,
+        interaction: discord.Interaction,
+        item: str,
+        continent: Optional[str] = None,
+    ):
+        item_key = parse_item_query(item)
+        continent = continent.strip() if continent else ALL_CONTINENTS
+        removed = await self.subscription_repository.unsubscribe(
+            interaction.user.id, item_key, continent
+        )
+        for sub_id in removed:
+            self.merchant_alerts.index.remove(sub_id)
+
+        if not removed:
+            await interaction.response.send_message(
+                "해당 알림을 찾을 수 없습니다.", ephemeral=True
+            )
+            return
+        await interaction.response.send_message(
+            f"**{item_label(item_key)}** ({continent or '전체 대륙'}) 알림을 해제했습니다.",
+            ephemeral=True,
+        )
+
+    @app_commands.command(
+        name="상인알림목록", description="등록한 떠돌이 상인 알림을 확인합니다."
+    )
+    async def list_merchant_subscriptions(self, interaction: discord.Interaction):
+        rows = await self.subscription_repository.list_for_user(interaction.user.id)
+        if not rows:
+            await interaction.response.send_message(
+                "등록된 알림이 없습니다.", ephemeral=True
+            )
+            return
+
+        lines = [
+            f"• **{item_label(row.item_key)}** ({row.continent or '전체 대륙'}) → "
+            + ("DM" if row.channel_id is None else f"<#{row.channel_id}>")
+            for row in rows
+        ]
+        await interaction.response.send_message(
+            "🔔 **떠돌이 상인 알림 목록**\n" + "\n".join(lines), ephemeral=True
+        )
+
+    @app_commands.command(
+        name="봇상태", description="커맨드/외부 API/DB 처리 시간을 확인합니다. (관리자)"
+    )
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.checks.has_permissions(administrator=True)
+    async def show_status(self, interaction: discord.Interaction):
+        uptime = int(time.time() - metrics.started_at)
+        embed = Embed(
+            title="봇 상태",
+            description=(
+                f"가동 시간: {uptime // 3600}시간 {uptime % 3600 // 60}분 · "
+                f"게이트웨이 지연: {self.bot.latency * 1000:.0f}ms · "
+                f"서버 {len(self.bot.guilds)}개"
+            ),
+            color=Color.blurple(),
+        )
+
+        errors: dict[str, float] = {}
+        for labels, value in metrics.counters("bot_command_errors_total"):
+            errors[labels["command"]] = errors.get(labels["command"], 0) + value
+        command_lines = _histogram_lines("bot_command_duration_seconds", "command")
+        if errors:
+            command_lines.append(
+                "에러: "
+                + ", ".join(f"`{name}` {int(n)}회" for name, n in errors.items())
+            )
+
+        statuses: dict[str, list] = {}
+        for labels, value in metrics.counters("http_client_requests_total"):
+            statuses.setdefault(labels["service"], []).append(
+                f"{labels['status']}: {int(value)}"
+            )
+        api_lines = _histogram_lines("http_client_request_duration_seconds", "service")
+        api_lines += [
+            f"`{service}` " + ", ".join(sorted(values))
+            for service, values in statuses.items()
+        ]
+        retries = sum(v for _, v in metrics.counters("lostark_api_retries_total"))
+        if retries:
+            api_lines.append(f"429 재시도: {int(retries)}회")
+
+        db_rows = sorted(
+            metrics.histograms("db_statement_duration_seconds"),
+            key=lambda row: row[1].count,
+            reverse=True,
+        )
+        db_lines = [
+            f"`{labels['engine']} {labels['operation']}` {h.count}회 · "
+            f"평균 {h.sum / h.count * 1000:.1f}ms · p95 {h.quantile(0.95) * 1000:.0f}ms"
+            for labels, h in db_rows[:STATUS_ROWS]
+        ]
+
+        for name, lines in (
+            ("커맨드", command_lines),
+            ("외부 API", api_lines),
+            ("DB", db_lines),
+        ):
+            embed.add_field(
+                name=name,
+                value="\n".join(lines)[:1024] or "기록 없음",
+                inline=False,
+            )
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
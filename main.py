@@ -1,40 +1,138 @@
-import os
+import time
+
+# 시작 시간 측정은 무거운 import보다 먼저 시작한다.
+STARTED_AT = time.perf_counter()
+
+import asyncio
 import discord
 from discord.ext import commands
-from dotenv import load_dotenv
-import asyncio
 
+from service.command_sync import sync_if_changed
+from utils.command_tree import InstrumentedCommandTree
 from utils.config import settings
-from utils.database import Database
+from utils.database import db
+from utils.lostark_api import lostark_client
 from utils.logger_config import logger
 
-load_dotenv()
-
 PREFIX = "!"
 TOKEN = settings.DISCORD_BOT_TOKEN
 
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix=PREFIX, intents=intents)
+
+
+def cluster_shard_ids(
+    cluster_id: int, cluster_count: int, shard_count: int
+) -> list[int]:
+    """
+    cluster_id번 워커가 맡을 연속된 샤드 범위. 워커 간 샤드 수 차이는 최대 1개다.
+    워커 수가 샤드 수보다 많으면 빈 범위가 나오므로 호출하는 쪽에서 막아야 한다.
+    """
+    start = cluster_id * shard_count // cluster_count
+    end = (cluster_id + 1) * shard_count // cluster_count
+    return list(range(start, end))
+
+
+def create_bot() -> commands.Bot:
+    if not settings.BOT_SHARDED:
+        return commands.Bot(
+            command_prefix=PREFIX, intents=intents, tree_cls=InstrumentedCommandTree
+        )
+    shard_ids = None
+    if settings.CLUSTER_ID is not None:
+        # cluster.py로 띄운 워커는 전체 샤드 중 자기 범위만 연결한다.
+        shard_ids = cluster_shard_ids(
+            settings.CLUSTER_ID, settings.CLUSTER_COUNT, settings.SHARD_COUNT
+        )
+        # 빈 목록을 넘기면 discord.py가 모든 샤드에 연결하므로 시작하지 않는다.
+        if not shard_ids:
+            raise SystemExit(
+                f"Cluster {settings.CLUSTER_ID} has no shards "
+                f"(CLUSTER_COUNT={settings.CLUSTER_COUNT}, "
+                f"SHARD_COUNT={settings.SHARD_COUNT})"
+            )
+        logger.info(f"Cluster {settings.CLUSTER_ID}: shards {shard_ids}")
+    return commands.AutoShardedBot(
+        command_prefix=PREFIX,
+        intents=intents,
+        tree_cls=InstrumentedCommandTree,
+        shard_count=settings.SHARD_COUNT,
+        shard_ids=shard_ids,
+    )
+
+
+bot = create_bot()
+
+
+# 마지막 연결 끊김 시각 (재연결 시간 측정용)
+_disconnected_at = None
+_ready_once = False
 
 
 @bot.event
-async def on_ready():
-    Database().create_all()
-    print(f"Logged in as {bot.user}.")
+async def setup_hook():
+    # 로그인 직후, 게이트웨이 연결 전에 한 번만 실행된다. (재연결 때는 실행되지 않음)
+    # 커맨드 트리는 봇 전체에 하나이므로 첫 번째 워커만 동기화한다.
+    if settings.CLUSTER_ID not in (None, 0):
+        return
+    started = time.perf_counter()
     try:
-        synced = await bot.tree.sync()
-        print(f"Slash commands synced: {len(synced)} commands")
-    except Exception as e:
-        print(e)
+        await sync_if_changed(bot.tree)
+    except discord.HTTPException:
+        logger.exception("Failed to sync slash commands")
+    logger.info(f"Command sync check took {time.perf_counter() - started:.2f}s")
+
+
+@bot.event
+async def on_ready():
+    global _ready_once, _disconnected_at
+    if not _ready_once:
+        _ready_once = True
+        logger.info(
+            f"Logged in as {bot.user}. "
+            f"Cold start took {time.perf_counter() - STARTED_AT:.2f}s"
+        )
+    elif _disconnected_at is not None:
+        logger.info(
+            f"Reconnected (new session) in {time.perf_counter() - _disconnected_at:.2f}s"
+        )
+    _disconnected_at = None
+
+
+@bot.event
+async def on_disconnect():
+    global _disconnected_at
+    if _disconnected_at is None:
+        _disconnected_at = time.perf_counter()
+
+
+@bot.event
+async def on_resumed():
+    global _disconnected_at
+    if _disconnected_at is not None:
+        logger.info(f"Session resumed in {time.perf_counter() - _disconnected_at:.2f}s")
+        _disconnected_at = None
 
 
 async def main():
+    # 코그가 cog_load에서 DB를 읽으므로 확장 로드 전에 스키마를 준비한다.
+    started = time.perf_counter()
+    await db.create_all()
+    logger.info(f"Schema ready in {time.perf_counter() - started:.2f}s")
+
+    started = time.perf_counter()
     await bot.load_extension("cogs.raids")
     await bot.load_extension("cogs.expedition")
     await bot.load_extension("cogs.utils")
-    logger.info("Bot loaded successfully.")
-    await bot.start(TOKEN)
+    logger.info(
+        f"Bot loaded successfully in {time.perf_counter() - started:.2f}s "
+        f"({time.perf_counter() - STARTED_AT:.2f}s since start)"
+    )
+    try:
+        await bot.start(TOKEN)
+    finally:
+        await lostark_client.close()
+        db.dispose()
 
 
 if __name__ == "__main__":
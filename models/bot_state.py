@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, Text, TIMESTAMP, func
+from . import Base
+
+
+class BotState(Base):
+    """
+    봇 내부 상태를 저장하는 key-value 테이블.
+    예: 백그라운드 작업의 진행 위치, 마지막으로 동기화한 커맨드 해시 등.
+    """
+
+    __tablename__ = "bot_state"
+
+    key = Column(String, primary_key=True)
+    value = Column(Text, nullable=False)
+    updated_at = Column(
+        TIMESTAMP,
+        server_default=func.current_timestamp(),
+        onupdate=func.current_timestamp(),
+    )
@@ -1,4 +1,13 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, TIMESTAMP, func
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Boolean,
+    ForeignKey,
+    TIMESTAMP,
+    func,
+    Index,
+)
 from sqlalchemy.orm import relationship
 from . import Base
 
@@ -17,6 +26,11 @@ class Expedition(Base):
         onupdate=func.current_timestamp(),
     )
 
+    # 유저당 서버별 원정대는 하나 (bulk upsert의 ON CONFLICT 대상)
+    __table_args__ = (
+        Index("ux_expeditions_user_server", "user_id", "server_name", unique=True),
+    )
+
     user = relationship("User", back_populates="expeditions")
     characters = relationship("ExpeditionCharacter", back_populates="expedition")
 
@@ -38,4 +52,14 @@ class ExpeditionCharacter(Base):
         onupdate=func.current_timestamp(),
     )
 
+    # 원정대 내 캐릭터명은 유일 (bulk upsert의 ON CONFLICT 대상)
+    __table_args__ = (
+        Index(
+            "ux_expedition_characters_expedition_name",
+            "expedition_id",
+            "character_name",
+            unique=True,
+        ),
+    )
+
     expedition = relationship("Expedition", back_populates="characters")
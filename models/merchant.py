@@ -0,0 +1,43 @@
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Boolean,
+    TIMESTAMP,
+    func,
+    Index,
+)
+from . import Base
+
+
+class MerchantSubscription(Base):
+    """
+    떠돌이 상인 아이템 알림 구독.
+    item_key: 알림 대상 아이템 (예: rapport:legendary, item:웨이)
+    continent: 특정 대륙만 받을 때 대륙명, 모든 대륙이면 빈 문자열
+    channel_id: 알림을 보낼 채널. None이면 DM으로 보낸다.
+    version: 마지막으로 등록/해지될 때의 구독 버전. 클러스터 리더가 바뀐 구독만 다시 읽는 데 쓴다.
+    """
+
+    __tablename__ = "merchant_subscriptions"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    discord_id = Column(Integer, nullable=False)
+    guild_id = Column(Integer, nullable=True)
+    channel_id = Column(Integer, nullable=True)
+    item_key = Column(String, nullable=False)
+    continent = Column(String, nullable=False, default="")
+    is_deleted = Column(Boolean, default=False, nullable=False)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
+
+    __table_args__ = (
+        Index(
+            "ux_merchant_subscriptions_user_item",
+            "discord_id",
+            "item_key",
+            "continent",
+            unique=True,
+        ),
+        Index("ix_merchant_subscriptions_version", "version"),
+    )
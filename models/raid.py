@@ -10,6 +10,7 @@ from sqlalchemy import (
     DateTime,
     Text,
     Float,
+    Index,
 )
 from sqlalchemy.orm import relationship, declarative_base
 import enum
@@ -50,6 +51,7 @@ class RaidType(Base):
     difficulty = Column(
         Enum(DifficultyLevel), nullable=False, default=DifficultyLevel.NORMAL
     )  # 난이도
+    min_item_level = Column(Integer, nullable=True)  # 입장 가능 아이템 레벨
     is_deleted = Column(Boolean, default=False, nullable=False)
     created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
 
@@ -98,7 +100,15 @@ class RaidRecruitment(Base):
     min_item_level = Column(Integer, nullable=True)  # 참가 조건(최소 아이템 레벨)
     end_time = Column(DateTime, nullable=True)  # 모집 마감 시간
     max_participants = Column(Integer, nullable=True)  # 최대 참가 인원
+    # 현재 참가 인원. 참가/취소 시 같은 트랜잭션에서 함께 갱신한다.
+    participant_count = Column(Integer, nullable=False, default=0, server_default="0")
     description = Column(Text, nullable=True)  # 모집 방에 대한 설명
+    # 모집을 올린 서버와 참가자 목록을 보여주는 디스코드 메시지 위치
+    guild_id = Column(Integer, nullable=True)
+    channel_id = Column(Integer, nullable=True)
+    message_id = Column(Integer, nullable=True)
+    # 목록에 보이는 값이 마지막으로 바뀔 때의 모집 버전 (RaidRepository.RECRUITMENT_VERSION_KEY)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
     is_deleted = Column(Boolean, default=False, nullable=False)
     created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
     updated_at = Column(
@@ -110,6 +120,8 @@ class RaidRecruitment(Base):
     participants = relationship("RaidParticipant", back_populates="raid_recruitment")
     raid_type = relationship("RaidType", back_populates="recruitments")
 
+    __table_args__ = (Index("ix_raid_recruitments_version", "version"),)
+
 
 class RaidParticipant(Base):
     """
@@ -132,5 +144,15 @@ class RaidParticipant(Base):
     item_level = Column(Integer, nullable=False)  # 아이템 레벨
     character_class = Column(String, nullable=False)  # 직업
 
+    # 모집당 유저는 한 번만 참가 (탈퇴는 is_deleted로 표시)
+    __table_args__ = (
+        Index(
+            "ux_raid_participants_recruitment_user",
+            "raid_recruitment_id",
+            "user_id",
+            unique=True,
+        ),
+    )
+
     raid_recruitment = relationship("RaidRecruitment", back_populates="participants")
     user = relationship("User", back_populates="raid_participations")
@@ -19,3 +19,17 @@ class User(Base):
     )
 
     expeditions = relationship("Expedition", back_populates="user")
+    raid_participations = relationship("RaidParticipant", back_populates="user")
+
+
+class GuildMember(Base):
+    """
+    유저가 봇을 사용한 서버(길드). 멤버 인텐트 없이 서버별 순위를 만들 때 쓴다.
+    /원정대등록, /주간골드, /골드순위를 해당 서버에서 사용하면 기록된다.
+    """
+
+    __tablename__ = "guild_members"
+
+    guild_id = Column(Integer, primary_key=True)
+    discord_id = Column(Integer, primary_key=True)
+    created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
@@ -0,0 +1,101 @@
+import json
+import time
+from typing import Optional
+from sqlalchemy import Integer, cast, delete, func, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models.bot_state import BotState
+from utils.database import Database
+
+
+def increment_counter(session: Session, key: str) -> int:
+    """
+    정수 카운터 key를 1 올리고 새 값을 반환한다. (없으면 1)
+    다른 리포지토리의 쓰기 트랜잭션 안에서 호출해 변경과 버전이 함께 커밋되게 한다.
+    """
+    stmt = sqlite_insert(BotState.__table__).values(key=key, value="1")
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[BotState.key],
+        set_={
+            "value": cast(BotState.value, Integer) + 1,
+            "updated_at": func.current_timestamp(),
+        },
+    ).returning(BotState.value)
+    return int(session.execute(stmt).scalar_one())
+
+
+class BotStateRepository:
+    def __init__(self, db: Database):
+        # 모든 쿼리는 db.read()/db.write()를 통해 DB 스레드 풀에서 실행된다.
+        self.db = db
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.db.read(self._get, key)
+
+    def _get(self, session: Session, key: str) -> Optional[str]:
+        return session.execute(
+            select(BotState.value).where(BotState.key == key)
+        ).scalar_one_or_none()
+
+    async def get_counter(self, key: str) -> int:
+        """increment_counter로 올린 카운터의 현재 값. (없으면 0)"""
+        value = await self.get(key)
+        return int(value) if value is not None else 0
+
+    async def set(self, key: str, value: str):
+        await self.db.write(self._set, key, value)
+
+    def _set(self, session: Session, key: str, value: str):
+        stmt = sqlite_insert(BotState.__table__).values(key=key, value=value)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[BotState.key],
+            set_={"value": stmt.excluded.value, "updated_at": func.current_timestamp()},
+        )
+        session.execute(stmt)
+        session.commit()
+
+    async def delete(self, key: str):
+        await self.db.write(self._delete, key)
+
+    def _delete(self, session: Session, key: str):
+        session.execute(delete(BotState).where(BotState.key == key))
+        session.commit()
+
+    async def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """
+        name 리스를 owner가 ttl초 동안 잡는다. 비어 있거나, 만료되었거나, 이미 owner가
+        잡고 있으면(갱신) True. 여러 프로세스가 동시에 시도해도 한 번의 조건부 upsert라 하나만 성공한다.
+        """
+        return await self.db.write(self._acquire_lease, name, owner, ttl)
+
+    def _acquire_lease(
+        self, session: Session, name: str, owner: str, ttl: float
+    ) -> bool:
+        now = time.time()
+        stmt = sqlite_insert(BotState.__table__).values(
+            key=name, value=json.dumps({"owner": owner, "expires_at": now + ttl})
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[BotState.key],
+            set_={"value": stmt.excluded.value, "updated_at": func.current_timestamp()},
+            where=or_(
+                func.json_extract(BotState.value, "$.owner") == owner,
+                func.json_extract(BotState.value, "$.expires_at") < now,
+            ),
+        ).returning(BotState.key)
+        acquired = session.execute(stmt).first() is not None
+        session.commit()
+        return acquired
+
+    async def release_lease(self, name: str, owner: str):
+        await self.db.write(self._release_lease, name, owner)
+
+    def _release_lease(self, session: Session, name: str, owner: str):
+        session.execute(
+            delete(BotState).where(
+                BotState.key == name,
+                func.json_extract(BotState.value, "$.owner") == owner,
+            )
+        )
+        session.commit()
@@ -1,77 +1,431 @@
-from typing import List
-from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+from sqlalchemy import String, func, select, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, selectinload
 
-from schemas.expedition import ExpeditionSchema
+from schemas.expedition import CharacterSchema, ExpeditionSchema
 from schemas.user import DiscordUserSchema
-from models.user import User
+from models.user import GuildMember, User
 from models.expedition import Expedition, ExpeditionCharacter
+from utils.cache import TTLCache
+from utils.config import settings
+from utils.database import Database
+from utils.logger_config import logger
+from utils.name_index import PrefixIndex
+
+logger = logger.getChild("repositories.expedition")
+
+users = User.__table__
+expeditions = Expedition.__table__
+characters = ExpeditionCharacter.__table__
+guild_members = GuildMember.__table__
+
+# discord_id별 저장된 원정대 조회 결과. upsert_expedition이 해당 유저 항목을 무효화한다.
+# 아래 캐시/인덱스는 프로세스별이라 클러스터에서는 다른 워커의 upsert를 알지 못한다.
+_saved_expeditions = TTLCache(
+    max_entries=settings.SAVED_EXPEDITION_CACHE_MAX_ENTRIES,
+    max_bytes=settings.SAVED_EXPEDITION_CACHE_MAX_BYTES,
+)
+# 조회 도중 upsert가 끝난 경우 오래된 결과를 캐시에 넣지 않기 위한 유저별 버전
+_versions: dict[int, int] = {}
+# 저장된 캐릭터명 자동완성 인덱스. upsert_expedition이 해당 유저의 이름만 갱신한다.
+_character_names = PrefixIndex()
+# 이 프로세스에서 이미 기록한 (guild_id, discord_id). 같은 쌍을 매번 쓰지 않는다.
+_known_guild_members: set = set()
 
 
 class ExpeditionRepository:
-    def __init__(self, session_factory):
-        # session_factory는 session을 제공하는 callble, 예: session_factory = sessionmaker(bind=engine)
-        self.session_factory = session_factory
+    def __init__(self, db: Database):
+        # 모든 쿼리는 db.read()/db.write()를 통해 DB 스레드 풀에서 실행된다.
+        self.db = db
 
-    def upsert_expedition(
+    async def upsert_expedition(
         self, user: DiscordUserSchema, expedition_list: List[ExpeditionSchema]
     ):
-        with self.session_factory() as session:  # SessionContext
-            # 유저 확인 또는 생성
-            db_user = (
-                session.query(User).filter(User.discord_id == user.discord_id).first()
-            )
-            if not db_user:
-                db_user = User(
-                    discord_id=user.discord_id,
-                    discord_name=user.discord_name,
-                    discord_avatar=user.discord_avatar,
-                )
-                session.add(db_user)
-                session.flush()
-
-            user_expeditions = (
-                session.query(Expedition).filter(Expedition.user_id == db_user.id).all()
-            )
-            for expedition in user_expeditions:
-                session.delete(expedition)
-            session.flush()
-            for expedition_data in expedition_list:
-                # 해당 유저에 맞는 Expedition 조회
-                db_expedition = (
-                    session.query(Expedition)
-                    .filter(
-                        Expedition.user_id == db_user.id,
-                        Expedition.server_name == expedition_data.server_name,
-                    )
-                    .first()
-                )
+        """
+        원정대 정보를 diff 기반으로 저장한다.
+        - 원정대/캐릭터는 INSERT ... ON CONFLICT DO UPDATE(executemany)로 한 번에 반영
+        - 직업, 아이템 레벨 등이 바뀐 캐릭터만 갱신하고, 사라진 캐릭터는 soft delete
+        - 기존 행을 지우지 않으므로 row id가 유지된다.
+        """
+        expedition_ids, changed, removed = await self.db.write(
+            self._upsert_expedition, user, expedition_list
+        )
+        _versions[user.discord_id] = _versions.get(user.discord_id, 0) + 1
+        _saved_expeditions.invalidate(user.discord_id)
+        _character_names.set_owned(
+            user.discord_id,
+            (char.character_name for exp in expedition_list for char in exp.characters),
+        )
 
-                if db_expedition:
-                    # 업데이트
-                    db_expedition.expedition_level = expedition_data.expedition_level
-                    # 캐릭터 정보는 전부 새로 넣기 위해 기존 것 삭제
-                    session.query(ExpeditionCharacter).filter_by(
-                        expedition_id=db_expedition.id
+        logger.info(
+            f"Upserted {len(expedition_ids)} expeditions for user {user.discord_id}: "
+            f"{changed} characters changed, {removed} removed"
+        )
+
+    async def get_expeditions(self, discord_id: int) -> List[ExpeditionSchema]:
+        """
+        유저가 저장한 원정대(삭제되지 않은 원정대/캐릭터)를 조회한다.
+        결과는 discord_id별로 캐시되며 upsert_expedition 시 무효화된다.
+        """
+        cached = _saved_expeditions.get(discord_id)
+        if cached is not None:
+            return cached
+
+        version = _versions.get(discord_id, 0)
+        expedition_list = await self.db.read(self._get_expeditions, discord_id)
+        if _versions.get(discord_id, 0) == version:
+            _saved_expeditions.set(
+                discord_id, expedition_list, ttl=settings.SAVED_EXPEDITION_CACHE_TTL
+            )
+        return expedition_list
+
+    def _get_expeditions(
+        self, session: Session, discord_id: int
+    ) -> List[ExpeditionSchema]:
+        # 원정대 1번 + 캐릭터 1번(selectin), 총 2번의 쿼리로 조회한다.
+        rows = (
+            session.execute(
+                select(Expedition)
+                .join(User, Expedition.user_id == User.id)
+                .where(User.discord_id == discord_id, ~Expedition.is_deleted)
+                .options(
+                    selectinload(
+                        Expedition.characters.and_(~ExpeditionCharacter.is_deleted)
                     )
-                else:
-                    # 신규 생성
-                    db_expedition = Expedition(
-                        user_id=db_user.id,
-                        server_name=expedition_data.server_name,
-                        expedition_level=expedition_data.expedition_level,
+                )
+                .order_by(Expedition.expedition_level.desc(), Expedition.id)
+            )
+            .scalars()
+            .all()
+        )
+        return [
+            ExpeditionSchema(
+                character_image="",  # 캐릭터 이미지는 저장하지 않는다.
+                server_name=expedition.server_name,
+                expedition_level=expedition.expedition_level,
+                characters=[
+                    CharacterSchema(
+                        character_name=char.character_name,
+                        character_class=char.character_class,
+                        item_level=char.item_level,
+                        server_name=char.server_name,
+                        main_character=char.main_character,
                     )
-                    session.add(db_expedition)
-                    session.flush()
-
-                # 캐릭터 정보 추가
-                for char_data in expedition_data.characters:
-                    db_char = ExpeditionCharacter(
-                        expedition_id=db_expedition.id,
-                        character_name=char_data.character_name,
-                        character_class=char_data.character_class,
-                        item_level=char_data.item_level,
-                        server_name=char_data.server_name,
+                    for char in sorted(
+                        expedition.characters, key=lambda c: -c.item_level
                     )
-                    session.add(db_char)
+                ],
+            )
+            for expedition in rows
+        ]
+
+    async def load_character_names(self):
+        """저장된 모든 캐릭터명으로 자동완성 인덱스를 만든다. (시작 시 1회)"""
+        rows = await self.db.read(self._list_character_names)
+        _character_names.load(rows)
+        logger.info(f"Indexed {len(_character_names)} character names")
+
+    def _list_character_names(self, session: Session) -> list:
+        return session.execute(
+            select(users.c.discord_id, characters.c.character_name)
+            .join(expeditions, expeditions.c.user_id == users.c.id)
+            .join(characters, characters.c.expedition_id == expeditions.c.id)
+            .where(
+                ~users.c.is_deleted,
+                ~expeditions.c.is_deleted,
+                ~characters.c.is_deleted,
+            )
+        ).all()
+
+    def search_character_names(
+        self, query: str, discord_id: Optional[int] = None, limit: int = 25
+    ) -> List[str]:
+        """저장된 캐릭터명 중 query로 시작(또는 초성이 일치)하는 이름. 본인 캐릭터가 먼저 온다."""
+        return _character_names.search(query, owner=discord_id, limit=limit)
+
+    async def get_stale_users(
+        self, older_than_hours: float, limit: int, after: Optional[Tuple] = None
+    ) -> list:
+        """
+        원정대 갱신 시각(Expedition.updated_at)이 가장 오래된 유저부터 조회한다.
+        after=(stale_at, user_id)를 주면 그 이후의 유저만 반환한다(keyset 페이지네이션).
+        각 행: user_id, discord_id, discord_name, discord_avatar, stale_at,
+        server_count, character_name(조회에 쓸 최고 레벨 캐릭터)
+        """
+        return await self.db.read(self._get_stale_users, older_than_hours, limit, after)
+
+    def _get_stale_users(
+        self,
+        session: Session,
+        older_than_hours: float,
+        limit: int,
+        after: Optional[Tuple],
+    ) -> list:
+        # 커서 비교가 저장된 문자열 형식 그대로 이뤄지도록 문자열로 받는다.
+        stale_at = func.min(expeditions.c.updated_at, type_=String).label("stale_at")
+        main_character = (
+            select(characters.c.character_name)
+            .join(expeditions, characters.c.expedition_id == expeditions.c.id)
+            .where(
+                expeditions.c.user_id == users.c.id,
+                ~expeditions.c.is_deleted,
+                ~characters.c.is_deleted,
+            )
+            .order_by(characters.c.item_level.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        stmt = (
+            select(
+                users.c.id.label("user_id"),
+                users.c.discord_id,
+                users.c.discord_name,
+                users.c.discord_avatar,
+                stale_at,
+                func.count(expeditions.c.id).label("server_count"),
+                main_character.label("character_name"),
+            )
+            .join(expeditions, expeditions.c.user_id == users.c.id)
+            .where(~users.c.is_deleted, ~expeditions.c.is_deleted)
+            .group_by(users.c.id)
+            .having(
+                stale_at < func.datetime("now", f"-{older_than_hours} hours"),
+            )
+            .order_by(stale_at, users.c.id)
+            .limit(limit)
+        )
+        if after is not None:
+            stmt = stmt.having(tuple_(stale_at, users.c.id) > tuple_(*after))
+        return session.execute(stmt).all()
+
+    def _upsert_expedition(
+        self,
+        session: Session,
+        user: DiscordUserSchema,
+        expedition_list: List[ExpeditionSchema],
+    ):
+        user_id = self._upsert_user(session, user)
+        expedition_ids = self._upsert_expeditions(session, user_id, expedition_list)
+        changed, removed = self._sync_characters(
+            session, expedition_ids, expedition_list
+        )
+        session.commit()
+        return expedition_ids, changed, removed
 
-            session.commit()
+    def _upsert_user(self, session: Session, user: DiscordUserSchema) -> int:
+        stmt = sqlite_insert(users).values(
+            discord_id=user.discord_id,
+            discord_name=user.discord_name,
+            discord_avatar=user.discord_avatar,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[users.c.discord_id],
+            set_={
+                "discord_name": stmt.excluded.discord_name,
+                "discord_avatar": stmt.excluded.discord_avatar,
+                "is_deleted": False,
+                "updated_at": func.current_timestamp(),
+            },
+            where=(users.c.discord_name != stmt.excluded.discord_name)
+            | users.c.discord_avatar.is_distinct_from(stmt.excluded.discord_avatar)
+            | users.c.is_deleted,
+        )
+        session.execute(stmt)
+        return session.execute(
+            select(users.c.id).where(users.c.discord_id == user.discord_id)
+        ).scalar_one()
+
+    def _upsert_expeditions(
+        self, session: Session, user_id: int, expedition_list: List[ExpeditionSchema]
+    ) -> dict:
+        """서버별 원정대를 upsert하고 {server_name: expedition_id}를 반환한다."""
+        server_names = [exp.server_name for exp in expedition_list]
+        if expedition_list:
+            stmt = sqlite_insert(expeditions)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[expeditions.c.user_id, expeditions.c.server_name],
+                set_={
+                    "expedition_level": stmt.excluded.expedition_level,
+                    "is_deleted": False,
+                    "updated_at": func.current_timestamp(),
+                },
+            )
+            session.execute(
+                stmt,
+                [
+                    {
+                        "user_id": user_id,
+                        "server_name": exp.server_name,
+                        "expedition_level": exp.expedition_level,
+                        "is_deleted": False,
+                    }
+                    for exp in expedition_list
+                ],
+            )
+
+        # 더 이상 존재하지 않는 서버의 원정대와 그 캐릭터는 soft delete
+        vanished = select(expeditions.c.id).where(
+            expeditions.c.user_id == user_id,
+            expeditions.c.server_name.notin_(server_names),
+            ~expeditions.c.is_deleted,
+        )
+        session.execute(
+            update(characters)
+            .where(
+                characters.c.expedition_id.in_(vanished),
+                ~characters.c.is_deleted,
+            )
+            .values(is_deleted=True, updated_at=func.current_timestamp())
+        )
+        session.execute(
+            update(expeditions)
+            .where(expeditions.c.id.in_(vanished))
+            .values(is_deleted=True, updated_at=func.current_timestamp())
+        )
+
+        rows = session.execute(
+            select(expeditions.c.server_name, expeditions.c.id).where(
+                expeditions.c.user_id == user_id,
+                expeditions.c.server_name.in_(server_names),
+            )
+        )
+        return dict(rows.all())
+
+    def _sync_characters(
+        self,
+        session: Session,
+        expedition_ids: dict,
+        expedition_list: List[ExpeditionSchema],
+    ):
+        """변경된 캐릭터만 upsert하고 사라진 캐릭터는 soft delete한다."""
+        existing = {
+            (row.expedition_id, row.character_name): row
+            for row in session.execute(
+                select(
+                    characters.c.id,
+                    characters.c.expedition_id,
+                    characters.c.character_name,
+                    characters.c.character_class,
+                    characters.c.item_level,
+                    characters.c.server_name,
+                    characters.c.main_character,
+                    characters.c.is_deleted,
+                ).where(characters.c.expedition_id.in_(expedition_ids.values()))
+            )
+        }
+
+        changed_rows = []
+        seen = set()
+        for exp in expedition_list:
+            expedition_id = expedition_ids[exp.server_name]
+            for char in exp.characters:
+                key = (expedition_id, char.character_name)
+                seen.add(key)
+                row = existing.get(key)
+                if (
+                    row is not None
+                    and not row.is_deleted
+                    and row.character_class == char.character_class
+                    and row.item_level == char.item_level
+                    and row.server_name == char.server_name
+                    and row.main_character == char.main_character
+                ):
+                    continue
+                changed_rows.append(
+                    {
+                        "expedition_id": expedition_id,
+                        "character_name": char.character_name,
+                        "character_class": char.character_class,
+                        "item_level": char.item_level,
+                        "server_name": char.server_name,
+                        "main_character": char.main_character,
+                        "is_deleted": False,
+                    }
+                )
+
+        if changed_rows:
+            stmt = sqlite_insert(characters)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[
+                    characters.c.expedition_id,
+                    characters.c.character_name,
+                ],
+                set_={
+                    "character_class": stmt.excluded.character_class,
+                    "item_level": stmt.excluded.item_level,
+                    "server_name": stmt.excluded.server_name,
+                    "main_character": stmt.excluded.main_character,
+                    "is_deleted": False,
+                    "updated_at": func.current_timestamp(),
+                },
+            )
+            session.execute(stmt, changed_rows)
+
+        removed_ids = [
+            row.id
+            for key, row in existing.items()
+            if key not in seen and not row.is_deleted
+        ]
+        if removed_ids:
+            session.execute(
+                update(characters)
+                .where(characters.c.id.in_(removed_ids))
+                .values(is_deleted=True, updated_at=func.current_timestamp())
+            )
+
+        return len(changed_rows), len(removed_ids)
+
+    async def add_guild_member(self, guild_id: int, discord_id: int):
+        """유저가 guild_id 서버에서 봇을 사용했음을 기록한다."""
+        if (guild_id, discord_id) in _known_guild_members:
+            return
+        await self.db.write(self._add_guild_member, guild_id, discord_id)
+        _known_guild_members.add((guild_id, discord_id))
+
+    def _add_guild_member(self, session: Session, guild_id: int, discord_id: int):
+        session.execute(
+            sqlite_insert(guild_members)
+            .values(guild_id=guild_id, discord_id=discord_id)
+            .on_conflict_do_nothing()
+        )
+        session.commit()
+
+    async def list_character_levels(
+        self, discord_id: Optional[int] = None, guild_id: Optional[int] = None
+    ) -> list:
+        """
+        등록된 유저의 활성 캐릭터 아이템 레벨. discord_id가 있으면 그 유저만,
+        guild_id가 있으면 그 서버에서 봇을 사용한 유저만 조회한다.
+        각 행: discord_id, discord_name, character_name, item_level
+        """
+        return await self.db.read(self._list_character_levels, discord_id, guild_id)
+
+    def _list_character_levels(
+        self, session: Session, discord_id: Optional[int], guild_id: Optional[int]
+    ) -> list:
+        stmt = (
+            select(
+                users.c.discord_id,
+                users.c.discord_name,
+                characters.c.character_name,
+                characters.c.item_level,
+            )
+            .join(expeditions, expeditions.c.user_id == users.c.id)
+            .join(characters, characters.c.expedition_id == expeditions.c.id)
+            .where(
+                ~users.c.is_deleted,
+                ~expeditions.c.is_deleted,
+                ~characters.c.is_deleted,
+            )
+        )
+        if discord_id is not None:
+            stmt = stmt.where(users.c.discord_id == discord_id)
+        if guild_id is not None:
+            # 멤버 목록을 IN (...)으로 넘기지 않고 기록된 서버 멤버와 조인한다.
+            stmt = stmt.join(
+                guild_members,
+                (guild_members.c.discord_id == users.c.discord_id)
+                & (guild_members.c.guild_id == guild_id),
+            )
+        return session.execute(stmt).all()
@@ -0,0 +1,138 @@
+from typing import List
+from sqlalchemy import select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models.merchant import MerchantSubscription
+from repositories.bot_state_repository import BotStateRepository, increment_counter
+from utils.database import Database
+
+subscriptions = MerchantSubscription.__table__
+
+# 구독이 등록/해지될 때마다 1씩 오르는 bot_state 카운터. 바뀐 행의 version에도 같은 값을 쓴다.
+VERSION_KEY = "merchant.subscriptions.version"
+
+
+class MerchantSubscriptionRepository:
+    def __init__(self, db: Database):
+        # 모든 쿼리는 db.read()/db.write()를 통해 DB 스레드 풀에서 실행된다.
+        self.db = db
+        self.state_repository = BotStateRepository(db)
+
+    async def current_version(self) -> int:
+        return await self.state_repository.get_counter(VERSION_KEY)
+
+    async def list_changed(self, since: int) -> List:
+        """version이 since보다 큰(그 뒤에 등록/해지된) 구독. 해지된 행도 포함한다."""
+        return await self.db.read(self._list_changed, since)
+
+    def _list_changed(self, session: Session, since: int) -> List:
+        return session.execute(
+            select(subscriptions)
+            .where(subscriptions.c.version > since)
+            .order_by(subscriptions.c.version)
+        ).all()
+
+    async def list_active(self) -> List:
+        """삭제되지 않은 모든 구독 (알림 인덱스 로드용)."""
+        return await self.db.read(self._list_active)
+
+    def _list_active(self, session: Session) -> List:
+        return session.execute(
+            select(subscriptions).where(~subscriptions.c.is_deleted)
+        ).all()
+
+    async def list_for_user(self, discord_id: int) -> List:
+        return await self.db.read(self._list_for_user, discord_id)
+
+    def _list_for_user(self, session: Session, discord_id: int) -> List:
+        return session.execute(
+            select(subscriptions)
+            .where(
+                subscriptions.c.discord_id == discord_id, ~subscriptions.c.is_deleted
+            )
+            .order_by(subscriptions.c.id)
+        ).all()
+
+    async def subscribe(
+        self,
+        discord_id: int,
+        guild_id,
+        channel_id,
+        item_key: str,
+        continent: str,
+    ):
+        """구독을 추가(또는 해지된 구독을 복구)하고 저장된 행을 반환한다."""
+        return await self.db.write(
+            self._subscribe, discord_id, guild_id, channel_id, item_key, continent
+        )
+
+    def _subscribe(
+        self,
+        session: Session,
+        discord_id: int,
+        guild_id,
+        channel_id,
+        item_key: str,
+        continent: str,
+    ):
+        version = increment_counter(session, VERSION_KEY)
+        stmt = sqlite_insert(subscriptions).values(
+            discord_id=discord_id,
+            guild_id=guild_id,
+            channel_id=channel_id,
+            item_key=item_key,
+            continent=continent,
+            is_deleted=False,
+            version=version,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[
+                subscriptions.c.discord_id,
+                subscriptions.c.item_key,
+                subscriptions.c.continent,
+            ],
+            set_={
+                "guild_id": stmt.excluded.guild_id,
+                "channel_id": stmt.excluded.channel_id,
+                "is_deleted": False,
+                "version": stmt.excluded.version,
+            },
+        )
+        session.execute(stmt)
+        session.commit()
+        return session.execute(
+            select(subscriptions).where(
+                subscriptions.c.discord_id == discord_id,
+                subscriptions.c.item_key == item_key,
+                subscriptions.c.continent == continent,
+            )
+        ).one()
+
+    async def unsubscribe(
+        self, discord_id: int, item_key: str, continent: str
+    ) -> List[int]:
+        """구독을 해지하고 해지된 구독 id 목록을 반환한다."""
+        return await self.db.write(self._unsubscribe, discord_id, item_key, continent)
+
+    def _unsubscribe(
+        self, session: Session, discord_id: int, item_key: str, continent: str
+    ) -> List[int]:
+        condition = (
+            (subscriptions.c.discord_id == discord_id)
+            & (subscriptions.c.item_key == item_key)
+            & (subscriptions.c.continent == continent)
+            & ~subscriptions.c.is_deleted
+        )
+        ids = (
+            session.execute(select(subscriptions.c.id).where(condition)).scalars().all()
+        )
+        if ids:
+            version = increment_counter(session, VERSION_KEY)
+            session.execute(
+                update(subscriptions)
+                .where(condition)
+                .values(is_deleted=True, version=version)
+            )
+            session.commit()
+        return list(ids)
@@ -0,0 +1,518 @@
+import asyncio
+import enum
+import weakref
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models.bot_state import BotState
+from models.expedition import Expedition, ExpeditionCharacter
+from models.raid import Raid, RaidGate, RaidParticipant, RaidRecruitment, RaidType
+from models.user import User
+from repositories.bot_state_repository import increment_counter
+from schemas.raid import RaidParticipantSchema, RaidRosterSchema
+from utils.database import Database
+from utils.logger_config import logger
+
+logger = logger.getChild("repositories.raid")
+
+users = User.__table__
+expeditions = Expedition.__table__
+characters = ExpeditionCharacter.__table__
+raids = Raid.__table__
+raid_types = RaidType.__table__
+gates = RaidGate.__table__
+recruitments = RaidRecruitment.__table__
+participants = RaidParticipant.__table__
+
+# 클러스터 워커들이 다른 워커의 변경을 알아채기 위한 bot_state 카운터.
+# 카탈로그가 바뀌면 CATALOG_VERSION_KEY를, 모집 목록에 보이는 값이 바뀌면
+# RECRUITMENT_VERSION_KEY를 올리고 바뀐 모집 행의 version에도 같은 값을 쓴다.
+CATALOG_VERSION_KEY = "raid.catalog.version"
+RECRUITMENT_VERSION_KEY = "raid.recruitments.version"
+
+# 모집별 참가/취소 lock. 진행 중인 클릭이 없는 모집의 lock은 자동으로 사라진다.
+_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def _recruitment_lock(recruitment_id: int) -> asyncio.Lock:
+    lock = _locks.get(recruitment_id)
+    if lock is None:
+        lock = _locks[recruitment_id] = asyncio.Lock()
+    return lock
+
+
+class JoinResult(enum.Enum):
+    JOINED = "joined"
+    ALREADY_JOINED = "already_joined"
+    FULL = "full"  # 정원 초과
+    CLOSED = "closed"  # 모집 중이 아님
+    NOT_FOUND = "not_found"
+    NO_CHARACTER = "no_character"  # 등록된 캐릭터 없음
+    ITEM_LEVEL_TOO_LOW = "item_level_too_low"
+
+
+class RaidRepository:
+    def __init__(self, db: Database):
+        # 모든 쿼리는 db.read()/db.write()를 통해 DB 스레드 풀에서 실행된다.
+        self.db = db
+
+    async def add_raid(
+        self,
+        name: str,
+        gold: int,
+        min_item_level: Optional[int] = None,
+        guild_id: Optional[int] = None,
+    ) -> Optional[int]:
+        """
+        레이드(노말, 1관문)를 추가하고 참가 모집을 연다.
+        min_item_level은 레이드 입장 레벨이자 모집의 참가 조건으로 쓰인다.
+        guild_id는 모집을 올린 서버로, 관리 명령을 그 서버에서만 허용하는 데 쓴다.
+        생성된 모집(RaidRecruitment) id를 반환하며, 이미 있는 레이드면 None.
+        """
+        return await self.db.write(self._add_raid, name, gold, min_item_level, guild_id)
+
+    def _add_raid(
+        self,
+        session: Session,
+        name: str,
+        gold: int,
+        min_item_level: Optional[int],
+        guild_id: Optional[int],
+    ) -> Optional[int]:
+        if session.query(Raid).filter(Raid.name == name).first():
+            return None
+
+        raid = Raid(name=name)
+        raid_type = RaidType(
+            raid=raid,
+            difficulty=RaidType.DifficultyLevel.NORMAL,
+            min_item_level=min_item_level,
+        )
+        RaidGate(raid_type=raid_type, gate_number=1, gold=gold)
+        recruitment = RaidRecruitment(
+            raid_type=raid_type,
+            min_item_level=min_item_level,
+            guild_id=guild_id,
+            version=increment_counter(session, RECRUITMENT_VERSION_KEY),
+        )
+        increment_counter(session, CATALOG_VERSION_KEY)
+        session.add(raid)
+        session.commit()
+        return recruitment.id
+
+    async def add_participant(self, recruitment_id: int, discord_id: int) -> JoinResult:
+        """
+        등록된 원정대 중 아이템 레벨이 가장 높은 캐릭터로 모집에 참가한다.
+        모집 상태/정원/최소 아이템 레벨/중복 여부를 한 번의 조건부 INSERT로 확인하고,
+        같은 모집에 대한 동시 클릭은 모집별 lock으로 순서대로 처리한다.
+        """
+        async with _recruitment_lock(recruitment_id):
+            return await self.db.write(
+                self._add_participant, recruitment_id, discord_id
+            )
+
+    def _add_participant(
+        self, session: Session, recruitment_id: int, discord_id: int
+    ) -> JoinResult:
+        best_character = (
+            select(
+                recruitments.c.id,
+                users.c.id,
+                characters.c.character_name,
+                characters.c.item_level,
+                characters.c.character_class,
+            )
+            .select_from(recruitments)
+            .join(users, users.c.discord_id == discord_id)
+            .join(
+                expeditions,
+                (expeditions.c.user_id == users.c.id) & ~expeditions.c.is_deleted,
+            )
+            .join(
+                characters,
+                (characters.c.expedition_id == expeditions.c.id)
+                & ~characters.c.is_deleted,
+            )
+            .where(
+                recruitments.c.id == recruitment_id,
+                recruitments.c.status == RaidRecruitment.RecruitmentStatus.OPEN,
+                ~recruitments.c.is_deleted,
+                or_(
+                    recruitments.c.max_participants.is_(None),
+                    recruitments.c.participant_count < recruitments.c.max_participants,
+                ),
+                or_(
+                    recruitments.c.min_item_level.is_(None),
+                    characters.c.item_level >= recruitments.c.min_item_level,
+                ),
+            )
+            .order_by(characters.c.item_level.desc())
+            .limit(1)
+        )
+        stmt = sqlite_insert(participants).from_select(
+            [
+                participants.c.raid_recruitment_id,
+                participants.c.user_id,
+                participants.c.character_name,
+                participants.c.item_level,
+                participants.c.character_class,
+            ],
+            best_character,
+        )
+        # 취소했던 참가는 되살리고, 이미 참가 중이면 아무것도 바꾸지 않는다.
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[participants.c.raid_recruitment_id, participants.c.user_id],
+            set_={
+                "is_deleted": False,
+                "character_name": stmt.excluded.character_name,
+                "item_level": stmt.excluded.item_level,
+                "character_class": stmt.excluded.character_class,
+                "joined_at": func.current_timestamp(),
+            },
+            where=participants.c.is_deleted,
+        )
+        if session.execute(stmt).rowcount:
+            session.execute(
+                update(recruitments)
+                .where(recruitments.c.id == recruitment_id)
+                .values(
+                    participant_count=recruitments.c.participant_count + 1,
+                    version=increment_counter(session, RECRUITMENT_VERSION_KEY),
+                )
+            )
+            session.commit()
+            return JoinResult.JOINED
+
+        result = self._join_failure_reason(session, recruitment_id, discord_id)
+        session.rollback()
+        return result
+
+    def _join_failure_reason(
+        self, session: Session, recruitment_id: int, discord_id: int
+    ) -> JoinResult:
+        """조건부 INSERT가 아무 행도 넣지 못한 이유를 찾는다. (실패한 클릭에서만 실행)"""
+        recruitment = session.execute(
+            select(
+                recruitments.c.status,
+                recruitments.c.max_participants,
+                recruitments.c.participant_count,
+                recruitments.c.min_item_level,
+            ).where(recruitments.c.id == recruitment_id, ~recruitments.c.is_deleted)
+        ).first()
+        if recruitment is None:
+            return JoinResult.NOT_FOUND
+
+        user_id = session.execute(
+            select(users.c.id).where(users.c.discord_id == discord_id)
+        ).scalar()
+        if (
+            user_id is not None
+            and session.execute(
+                select(participants.c.id).where(
+                    participants.c.raid_recruitment_id == recruitment_id,
+                    participants.c.user_id == user_id,
+                    ~participants.c.is_deleted,
+                )
+            ).first()
+        ):
+            return JoinResult.ALREADY_JOINED
+        if recruitment.status != RaidRecruitment.RecruitmentStatus.OPEN:
+            return JoinResult.CLOSED
+        if (
+            recruitment.max_participants is not None
+            and recruitment.participant_count >= recruitment.max_participants
+        ):
+            return JoinResult.FULL
+
+        best_item_level = session.execute(
+            select(func.max(characters.c.item_level))
+            .join(expeditions, characters.c.expedition_id == expeditions.c.id)
+            .where(
+                expeditions.c.user_id == user_id,
+                ~expeditions.c.is_deleted,
+                ~characters.c.is_deleted,
+            )
+        ).scalar()
+        if best_item_level is None:
+            return JoinResult.NO_CHARACTER
+        return JoinResult.ITEM_LEVEL_TOO_LOW
+
+    async def remove_participant(self, recruitment_id: int, discord_id: int) -> bool:
+        """참가를 취소한다. 참가 중이 아니었으면 False."""
+        async with _recruitment_lock(recruitment_id):
+            return await self.db.write(
+                self._remove_participant, recruitment_id, discord_id
+            )
+
+    def _remove_participant(
+        self, session: Session, recruitment_id: int, discord_id: int
+    ) -> bool:
+        user_ids = select(users.c.id).where(users.c.discord_id == discord_id)
+        removed = session.execute(
+            update(participants)
+            .where(
+                participants.c.raid_recruitment_id == recruitment_id,
+                participants.c.user_id.in_(user_ids),
+                ~participants.c.is_deleted,
+            )
+            .values(is_deleted=True)
+        ).rowcount
+        if removed:
+            session.execute(
+                update(recruitments)
+                .where(recruitments.c.id == recruitment_id)
+                .values(
+                    participant_count=recruitments.c.participant_count - removed,
+                    version=increment_counter(session, RECRUITMENT_VERSION_KEY),
+                )
+            )
+        session.commit()
+        return bool(removed)
+
+    async def set_message(self, recruitment_id: int, channel_id: int, message_id: int):
+        """참가자 목록을 보여줄 메시지 위치를 저장한다."""
+        await self.db.write(self._set_message, recruitment_id, channel_id, message_id)
+
+    def _set_message(
+        self, session: Session, recruitment_id: int, channel_id: int, message_id: int
+    ):
+        session.execute(
+            update(recruitments)
+            .where(recruitments.c.id == recruitment_id)
+            .values(channel_id=channel_id, message_id=message_id)
+        )
+        session.commit()
+
+    async def get_roster(self, recruitment_id: int) -> Optional[RaidRosterSchema]:
+        """모집 정보와 현재 참가자 목록(참가 순)을 조회한다."""
+        return await self.db.read(self._get_roster, recruitment_id)
+
+    def _get_roster(
+        self, session: Session, recruitment_id: int
+    ) -> Optional[RaidRosterSchema]:
+        recruitment = session.execute(
+            select(
+                recruitments.c.id,
+                recruitments.c.raid_type_id,
+                recruitments.c.status,
+                recruitments.c.min_item_level,
+                recruitments.c.end_time,
+                recruitments.c.max_participants,
+                recruitments.c.guild_id,
+                recruitments.c.channel_id,
+                recruitments.c.message_id,
+            ).where(recruitments.c.id == recruitment_id, ~recruitments.c.is_deleted)
+        ).first()
+        if recruitment is None:
+            return None
+
+        rows = session.execute(
+            select(
+                participants.c.character_name,
+                participants.c.character_class,
+                participants.c.item_level,
+            )
+            .where(
+                participants.c.raid_recruitment_id == recruitment_id,
+                ~participants.c.is_deleted,
+            )
+            .order_by(participants.c.joined_at, participants.c.id)
+        ).all()
+        return RaidRosterSchema(
+            recruitment_id=recruitment.id,
+            raid_type_id=recruitment.raid_type_id,
+            status=recruitment.status.value,
+            min_item_level=recruitment.min_item_level,
+            end_time=recruitment.end_time,
+            max_participants=recruitment.max_participants,
+            guild_id=recruitment.guild_id,
+            channel_id=recruitment.channel_id,
+            message_id=recruitment.message_id,
+            participants=[RaidParticipantSchema(**row._mapping) for row in rows],
+        )
+
+    async def list_open_recruitments(self) -> List:
+        """모집 중인 모든 모집 (목록 인덱스 초기 로드용)."""
+        return await self.db.read(self._list_open_recruitments)
+
+    def _list_open_recruitments(self, session: Session) -> List:
+        return session.execute(self._open_recruitments_query()).all()
+
+    async def get_open_recruitment(self, recruitment_id: int):
+        """모집 중인 모집 한 건. 마감/취소/삭제되었으면 None."""
+        return await self.db.read(self._get_open_recruitment, recruitment_id)
+
+    def _get_open_recruitment(self, session: Session, recruitment_id: int):
+        return session.execute(
+            self._open_recruitments_query().where(recruitments.c.id == recruitment_id)
+        ).first()
+
+    @staticmethod
+    def _open_recruitments_query():
+        # 레이드명/난이도는 raid_type_id로 레이드 카탈로그에서 찾는다.
+        return select(
+            recruitments.c.id,
+            recruitments.c.raid_type_id,
+            recruitments.c.min_item_level,
+            recruitments.c.end_time,
+            recruitments.c.max_participants,
+            recruitments.c.participant_count,
+        ).where(
+            recruitments.c.status == RaidRecruitment.RecruitmentStatus.OPEN,
+            ~recruitments.c.is_deleted,
+        )
+
+    async def list_changed_recruitments(self, since: int) -> List:
+        """
+        version이 since보다 큰(그 뒤에 바뀐) 모집. 마감/취소/삭제된 모집도 포함하며
+        _open_recruitments_query의 컬럼에 status, is_deleted가 더해진다.
+        """
+        return await self.db.read(self._list_changed_recruitments, since)
+
+    def _list_changed_recruitments(self, session: Session, since: int) -> List:
+        return session.execute(
+            select(
+                recruitments.c.id,
+                recruitments.c.raid_type_id,
+                recruitments.c.min_item_level,
+                recruitments.c.end_time,
+                recruitments.c.max_participants,
+                recruitments.c.participant_count,
+                recruitments.c.status,
+                recruitments.c.is_deleted,
+            )
+            .where(recruitments.c.version > since)
+            .order_by(recruitments.c.version)
+        ).all()
+
+    async def current_versions(self) -> Tuple[int, int]:
+        """(카탈로그 버전, 모집 버전). 아직 한 번도 오르지 않은 카운터는 0."""
+        return await self.db.read(self._current_versions)
+
+    def _current_versions(self, session: Session) -> Tuple[int, int]:
+        values = dict(
+            session.execute(
+                select(BotState.key, BotState.value).where(
+                    BotState.key.in_((CATALOG_VERSION_KEY, RECRUITMENT_VERSION_KEY))
+                )
+            ).all()
+        )
+        return (
+            int(values.get(CATALOG_VERSION_KEY, 0)),
+            int(values.get(RECRUITMENT_VERSION_KEY, 0)),
+        )
+
+    async def bump_catalog_version(self):
+        """DB에서 직접 고친 카탈로그를 다른 워커도 다시 읽게 한다. (/레이드정보갱신)"""
+        await self.db.write(self._bump_catalog_version)
+
+    def _bump_catalog_version(self, session: Session):
+        increment_counter(session, CATALOG_VERSION_KEY)
+        session.commit()
+
+    async def list_deadlines(self) -> List:
+        """마감 시각이 정해진 모집 중인 모집의 (id, end_time). (마감 스케줄러 초기 로드용)"""
+        return await self.db.read(self._list_deadlines)
+
+    def _list_deadlines(self, session: Session) -> List:
+        return session.execute(
+            select(recruitments.c.id, recruitments.c.end_time).where(
+                recruitments.c.status == RaidRecruitment.RecruitmentStatus.OPEN,
+                recruitments.c.end_time.is_not(None),
+                ~recruitments.c.is_deleted,
+            )
+        ).all()
+
+    async def set_end_time(
+        self, recruitment_id: int, end_time: Optional[datetime]
+    ) -> bool:
+        """모집 중인 모집의 마감 시각을 바꾼다. 모집 중이 아니면 False."""
+        return await self.db.write(self._set_end_time, recruitment_id, end_time)
+
+    def _set_end_time(
+        self, session: Session, recruitment_id: int, end_time: Optional[datetime]
+    ) -> bool:
+        updated = session.execute(
+            update(recruitments)
+            .where(
+                recruitments.c.id == recruitment_id,
+                recruitments.c.status == RaidRecruitment.RecruitmentStatus.OPEN,
+                ~recruitments.c.is_deleted,
+            )
+            .values(
+                end_time=end_time,
+                version=increment_counter(session, RECRUITMENT_VERSION_KEY),
+            )
+        ).rowcount
+        if not updated:
+            session.rollback()  # 올린 버전도 되돌린다.
+            return False
+        session.commit()
+        return True
+
+    async def close_expired(
+        self, recruitment_ids: List[int], now: datetime
+    ) -> List[int]:
+        """
+        마감 시각이 now 이전인 모집을 한 번의 UPDATE로 마감(CLOSED)하고 마감된 id를 반환한다.
+        그 사이 마감 시각이 늦춰졌거나 이미 마감/취소된 모집은 건드리지 않는다.
+        """
+        return await self.db.write(self._close_expired, recruitment_ids, now)
+
+    def _close_expired(
+        self, session: Session, recruitment_ids: List[int], now: datetime
+    ) -> List[int]:
+        closed = (
+            session.execute(
+                update(recruitments)
+                .where(
+                    recruitments.c.id.in_(recruitment_ids),
+                    recruitments.c.status == RaidRecruitment.RecruitmentStatus.OPEN,
+                    recruitments.c.end_time <= now,
+                    ~recruitments.c.is_deleted,
+                )
+                .values(
+                    status=RaidRecruitment.RecruitmentStatus.CLOSED,
+                    version=increment_counter(session, RECRUITMENT_VERSION_KEY),
+                )
+                .returning(recruitments.c.id)
+            )
+            .scalars()
+            .all()
+        )
+        if not closed:
+            session.rollback()
+            return []
+        session.commit()
+        return list(closed)
+
+    async def load_catalog(self) -> Tuple[List, List, List]:
+        """
+        레이드 카탈로그용 기준 정보 (삭제되지 않은 행만).
+        (raids: id, name), (raid_types: id, raid_id, difficulty, min_item_level),
+        (raid_gates: raid_type_id, gate_number, gold)
+        """
+        return await self.db.read(self._load_catalog)
+
+    def _load_catalog(self, session: Session) -> Tuple[List, List, List]:
+        return (
+            session.execute(
+                select(raids.c.id, raids.c.name).where(~raids.c.is_deleted)
+            ).all(),
+            session.execute(
+                select(
+                    raid_types.c.id,
+                    raid_types.c.raid_id,
+                    raid_types.c.difficulty,
+                    raid_types.c.min_item_level,
+                ).where(~raid_types.c.is_deleted)
+            ).all(),
+            session.execute(
+                select(gates.c.raid_type_id, gates.c.gate_number, gates.c.gold).where(
+                    ~gates.c.is_deleted
+                )
+            ).all(),
+        )
@@ -0,0 +1,23 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class RaidParticipantSchema(BaseModel):
+    character_name: str
+    character_class: str
+    item_level: int
+
+
+class RaidRosterSchema(BaseModel):
+    recruitment_id: int
+    raid_type_id: int
+    status: str
+    min_item_level: Optional[int] = None
+    end_time: Optional[datetime] = None
+    max_participants: Optional[int] = None
+    guild_id: Optional[int] = None
+    channel_id: Optional[int] = None
+    message_id: Optional[int] = None
+    participants: list[RaidParticipantSchema]
@@ -0,0 +1,42 @@
+import hashlib
+import json
+
+from discord import app_commands
+
+from repositories.bot_state_repository import BotStateRepository
+from utils.database import db
+from utils.logger_config import logger
+
+logger = logger.getChild("service.command_sync")
+
+HASH_KEY = "command_tree.hash"
+
+
+def command_tree_hash(tree: app_commands.CommandTree) -> str:
+    """로컬 커맨드 트리(글로벌 커맨드)를 디스코드에 보내는 형태 그대로 직렬화한 해시."""
+    payload = sorted(
+        (command.to_dict(tree) for command in tree.get_commands()),
+        key=lambda data: (data.get("type", 1), data["name"]),
+    )
+    body = json.dumps(
+        {"application_id": tree.client.application_id, "commands": payload},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+async def sync_if_changed(tree: app_commands.CommandTree) -> bool:
+    """
+    마지막으로 동기화한 트리와 해시가 다를 때만 tree.sync()를 호출한다.
+    sync는 레이트 리밋이 빡빡한 글로벌 API라 재시작/재연결마다 부르지 않는다.
+    """
+    state_repository = BotStateRepository(db)
+    current = command_tree_hash(tree)
+    if await state_repository.get(HASH_KEY) == current:
+        logger.info("Command tree unchanged, skipping sync")
+        return False
+    synced = await tree.sync()
+    await state_repository.set(HASH_KEY, current)
+    logger.info(f"Slash commands synced: {len(synced)} commands")
+    return True
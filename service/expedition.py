@@ -1,89 +1,136 @@
+import asyncio
 import logging
 from schemas.expedition import CharacterSchema, ExpeditionSchema
 from schemas.user import DiscordUserSchema
-from utils.config import settings
-import requests
 
 from repositories.expedition_repository import ExpeditionRepository
-from utils.database import Database
+from utils.cache import normalize_name
+from utils.database import db
+from utils.lostark_api import LostArkAPIError, lostark_client
 from utils.logger_config import logger
+from utils.rate_limiter import Priority
+from utils.singleflight import SingleFlight
+
+# 같은 캐릭터에 대한 동시 조회(siblings + 서버별 armory)를 하나로 합친다.
+_expedition_flight = SingleFlight()
 
 
 class ExpeditionService:
     def __init__(self):
-        self.db = Database()
-        self.expedition_repository = ExpeditionRepository(self.db.Session)
+        self.db = db
+        self.expedition_repository = ExpeditionRepository(self.db)
 
-    def get_and_save_expedition(
-        self, user: DiscordUserSchema, character_name: str, register: bool = False
+    async def _fetch_profile(
+        self,
+        main_char_name: str,
+        fresh: bool = False,
+        priority: Priority = Priority.INTERACTIVE,
     ):
-        logger.info(f"Fetching expedition info for {character_name}")
+        """메인 캐릭터 프로필 조회. 실패 시 빈 이미지, 0레벨로 대체한다."""
+        try:
+            profile_data = await lostark_client.get_armory_profile(
+                main_char_name, fresh=fresh, priority=priority
+            )
+        except LostArkAPIError as e:
+            logger.warning(f"Failed to fetch profile for {main_char_name}: {e}")
+            return "", 0
+        if not profile_data:
+            return None
+        armory_profile = profile_data.get("ArmoryProfile") or {}
+        return (
+            armory_profile.get("CharacterImage", ""),
+            armory_profile.get("ExpeditionLevel", 0),
+        )
 
-        url = f"https://developer-lostark.game.onstove.com/characters/{character_name}/siblings"
-        headers = {
-            "accept": "application/json",
-            "authorization": f"Bearer {settings.LOSTARK_API_KEY}",
-        }
+    async def get_and_save_expedition(
+        self,
+        user: DiscordUserSchema,
+        character_name: str,
+        register: bool = False,
+        priority: Priority = Priority.INTERACTIVE,
+    ):
+        # 등록은 항상 최신 정보로 저장하고, 검색은 캐시된 응답을 허용한다.
+        msg, expedition_list = await self.fetch_expeditions(
+            character_name, fresh=register, priority=priority
+        )
+        if register and expedition_list is not None:
+            try:
+                await self.expedition_repository.upsert_expedition(
+                    user, expedition_list
+                )
+            except Exception:
+                logger.exception("Error saving expedition data")
+                return "원정대 정보를 저장하는 데 실패했습니다.", None
+        return msg, expedition_list
+
+    async def fetch_expeditions(
+        self,
+        character_name: str,
+        fresh: bool = False,
+        priority: Priority = Priority.INTERACTIVE,
+    ):
+        """
+        캐릭터명으로 원정대 정보를 조회한다.
+        같은 캐릭터에 대한 동시 요청은 한 번만 수행하고 결과를 함께 받는다.
+        """
+        return await _expedition_flight.do(
+            ("expedition", normalize_name(character_name), fresh),
+            lambda: self._fetch_expeditions(character_name, fresh, priority),
+        )
+
+    async def _fetch_expeditions(
+        self, character_name: str, fresh: bool, priority: Priority
+    ):
+        logger.info(f"Fetching expedition info for {character_name}")
 
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
-            logger.warning(
-                f"Failed to fetch siblings for {character_name}, status {response.status_code}"
-            )
-            return "원정대 정보를 불러오는 데 실패했습니다.", None
         try:
-            data = response.json()
-        except Exception as e:
-            logger.error(f"Error parsing expedition data: {e}")
+            data = await lostark_client.get_siblings(
+                character_name, fresh=fresh, priority=priority
+            )
+        except LostArkAPIError as e:
+            logger.warning(f"Failed to fetch siblings for {character_name}: {e}")
             return "원정대 정보를 불러오는 데 실패했습니다.", None
-        print("*" * 50)
-        print(data)
-        print("*" * 50)
+        logger.debug(
+            f"Siblings for {character_name}: "
+            f"{len(data) if isinstance(data, list) else type(data).__name__}"
+        )
         if not isinstance(data, list) or len(data) == 0:
             logger.info(f"No expedition data for {character_name}")
             return "유효한 원정대 정보를 찾을 수 없습니다.", None
 
         try:
-            server_list = list({char["ServerName"] for char in data})
-            expedition_list = []
-            for server in server_list:
-                charater_list = []
-                for char in data:
-                    if char["ServerName"] == server:
-                        charater = CharacterSchema(
-                            character_name=char["CharacterName"],
-                            character_class=char["CharacterClassName"],
-                            item_level=int(
-                                float(char["ItemAvgLevel"].replace(",", ""))
-                            ),
-                            server_name=char["ServerName"],
-                        )
-                        charater_list.append(charater)
+            server_characters = {}
+            for char in data:
+                charater = CharacterSchema(
+                    character_name=char["CharacterName"],
+                    character_class=char["CharacterClassName"],
+                    item_level=int(float(char["ItemAvgLevel"].replace(",", ""))),
+                    server_name=char["ServerName"],
+                )
+                server_characters.setdefault(char["ServerName"], []).append(charater)
 
-                # 메인 캐릭터 지정
+            # 메인 캐릭터 지정
+            for charater_list in server_characters.values():
                 charater_list.sort(key=lambda c: c.item_level, reverse=True)
                 charater_list[0].main_character = True
-                main_char_name = charater_list[0].character_name
 
-                # 메인 캐릭터 프로필 조회
-                profile_url = f"https://developer-lostark.game.onstove.com/armories/characters/{main_char_name}?filters=cards%2Bprofiles"
-                profile_headers = {
-                    "accept": "application/json",
-                    "authorization": f"Bearer {settings.LOSTARK_API_KEY}",
-                }
-                profile_response = requests.get(profile_url, headers=profile_headers)
-                if profile_response.status_code == 200:
-                    profile_data = profile_response.json()
-                    if not profile_data:
-                        continue
-                    armory_profile = profile_data.get("ArmoryProfile", {})
-                    main_profile = armory_profile.get("CharacterImage", "")
-                    expedition_level = armory_profile.get("ExpeditionLevel", 0)
-                else:
-                    logger.warning(f"Failed to fetch profile for {main_char_name}")
-                    main_profile = ""
-                    expedition_level = 0
+            # 서버별 메인 캐릭터 프로필을 동시에 조회
+            profiles = await asyncio.gather(
+                *(
+                    self._fetch_profile(
+                        charater_list[0].character_name, fresh=fresh, priority=priority
+                    )
+                    for charater_list in server_characters.values()
+                )
+            )
 
+            expedition_list = []
+            for (server, charater_list), profile in zip(
+                server_characters.items(), profiles
+            ):
+                if profile is None:
+                    continue
+                main_profile, expedition_level = profile
                 expedition = ExpeditionSchema(
                     character_image=main_profile,
                     server_name=server,
@@ -92,9 +139,6 @@ class ExpeditionService:
                 )
                 expedition_list.append(expedition)
 
-            if register:
-                self.expedition_repository.upsert_expedition(user, expedition_list)
-
             logger.info(
                 f"Fetched expedition info for {character_name}, {len(expedition_list)} expeditions found."
             )
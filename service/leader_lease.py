@@ -0,0 +1,41 @@
+import os
+import socket
+
+from repositories.bot_state_repository import BotStateRepository
+from utils.config import settings
+from utils.database import db
+from utils.logger_config import logger
+
+logger = logger.getChild("service.leader_lease")
+
+# 이 프로세스를 구분하는 리스 소유자 이름
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaderLease:
+    """
+    여러 워커 프로세스 중 하나만 백그라운드 작업을 돌리도록 bot_state에 리스를 잡는다.
+    작업을 돌리기 직전에 acquire(ttl)로 잡거나 갱신하고, ttl은 다음 실행까지의 간격보다 길게 준다.
+    리더가 죽으면 ttl이 지난 뒤 다른 프로세스가 이어받는다.
+    클러스터가 아니면(CLUSTER_COUNT=1) DB를 거치지 않고 항상 리더다.
+    """
+
+    def __init__(self, name: str):
+        self.name = f"lease.{name}"
+        self.enabled = settings.CLUSTER_COUNT > 1
+        self.state_repository = BotStateRepository(db)
+        self.held = not self.enabled
+
+    async def acquire(self, ttl: float) -> bool:
+        if not self.enabled:
+            return True
+        held = await self.state_repository.acquire_lease(self.name, OWNER, ttl)
+        if held != self.held:
+            logger.info(f"{'Acquired' if held else 'Lost'} {self.name} ({OWNER})")
+        self.held = held
+        return held
+
+    async def release(self):
+        if self.enabled and self.held:
+            await self.state_repository.release_lease(self.name, OWNER)
+            self.held = False
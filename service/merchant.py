@@ -0,0 +1,318 @@
+import asyncio
+import json
+from datetime import datetime, time, timedelta
+from typing import Awaitable, Callable, Optional
+
+import aiohttp
+import pytz
+from dateutil import parser as date_parser
+
+from repositories.bot_state_repository import BotStateRepository
+from service.leader_lease import LeaderLease
+from utils.config import settings
+from utils.database import db
+from utils.logger_config import logger
+from utils.metrics import http_trace_config
+
+logger = logger.getChild("service.merchant")
+
+KST = pytz.timezone("Asia/Seoul")
+
+# 클러스터 모드에서 리더가 폴링한 결과를 다른 워커와 공유하는 bot_state 키
+SNAPSHOT_KEY = "merchant.snapshot"
+
+# 떠돌이 상인 등장 시간대 (KST, 시작 ~ 종료)
+MERCHANT_INTERVALS = [
+    (time(22, 0), time(3, 30)),
+    (time(16, 0), time(21, 30)),
+    (time(10, 0), time(15, 30)),
+    (time(4, 0), time(9, 30)),
+]
+
+
+def now_kst() -> datetime:
+    """현재 KST 시각 (tzinfo 없는 datetime)."""
+    return datetime.now(KST).replace(tzinfo=None)
+
+
+def get_interval_start(now: datetime) -> Optional[datetime]:
+    """now(KST)가 속한 떠상 시간대의 시작 시각. 시간대 밖이면 None."""
+    current_time = now.time()
+    for start_t, end_t in MERCHANT_INTERVALS:
+        if start_t <= end_t:
+            if start_t <= current_time <= end_t:
+                return datetime.combine(now.date(), start_t)
+        elif current_time >= start_t or current_time <= end_t:
+            start_date = now.date()
+            if current_time <= end_t:
+                start_date -= timedelta(days=1)
+            return datetime.combine(start_date, start_t)
+    return None
+
+
+def get_interval_end(interval_start: datetime) -> datetime:
+    for start_t, end_t in MERCHANT_INTERVALS:
+        if start_t == interval_start.time():
+            end = datetime.combine(interval_start.date(), end_t)
+            return end if end > interval_start else end + timedelta(days=1)
+    raise ValueError(f"Unknown interval start: {interval_start}")
+
+
+def get_next_interval_start(now: datetime) -> datetime:
+    candidates = [
+        datetime.combine(now.date() + timedelta(days=day), start_t)
+        for day in (0, 1)
+        for start_t, _ in MERCHANT_INTERVALS
+    ]
+    return min(c for c in candidates if c > now)
+
+
+def _parse_created_at(value: str) -> datetime:
+    """API의 created_at(UTC)을 tzinfo 없는 KST datetime으로 변환한다."""
+    parsed = date_parser.parse(value)
+    if parsed.tzinfo is not None:
+        return parsed.astimezone(KST).replace(tzinfo=None)
+    return parsed + timedelta(hours=9)
+
+
+class MerchantSnapshot:
+    """한 시간대의 떠상 정보를 대륙별로 미리 묶고 embed 필드 문자열까지 만들어 둔 결과."""
+
+    __slots__ = ("interval_start", "fetched_at", "merchants", "fields")
+
+    def __init__(
+        self,
+        interval_start: datetime,
+        fetched_at: datetime,
+        merchants: list,
+        fields: list,
+    ):
+        self.interval_start = interval_start
+        self.fetched_at = fetched_at
+        self.merchants = merchants  # 시간대 내에 등록된 원본 항목
+        self.fields = fields  # [(대륙 필드명, 필드 값)]
+
+
+def build_fields(merchants: list) -> list:
+    """대륙별로 아이템을 묶어 embed 필드 (name, value) 목록을 만든다."""
+    continent_map = {}
+
+    for m in merchants:
+        continent = m.get("continent", "알 수 없음")
+        items_data = m.get("items", [])
+
+        # dict를 순서 있는 set으로 사용 (중복 제거 + 등록 순서 유지)
+        items_dict = continent_map.setdefault(
+            continent,
+            {"cards": {}, "heroic_likes": {}, "legendary_likes": {}, "others": {}},
+        )
+
+        for it in items_data:
+            it_type = it.get("type", "")
+            content = it.get("content", "")
+
+            if it_type == 0:  # 카드
+                items_dict["cards"][f"**{content}**"] = None
+            elif it_type == 1:  # 호감도
+                if content == "0":
+                    items_dict["heroic_likes"]["영웅 호감도"] = None
+                elif content == "1":
+                    items_dict["legendary_likes"]["**전설 호감도**"] = None
+                else:
+                    items_dict["others"][f"**{content}**"] = None
+            else:  # 기타
+                items_dict["others"][f"**{content}**"] = None
+
+    # 대륙별로 하나의 필드만 추가
+    fields = []
+    for continent, items_dict in continent_map.items():
+        parts = []
+        if items_dict["cards"]:
+            parts.append(
+                "**[카드]**\n" + "\n".join(f"• {c}" for c in items_dict["cards"])
+            )
+        # 호감도 묶어서 표현
+        likes = [*items_dict["heroic_likes"], *items_dict["legendary_likes"]]
+        if likes:
+            parts.append("**[호감도]**\n" + "\n".join(f"• {l}" for l in likes))
+        if items_dict["others"]:
+            parts.append(
+                "**[기타 아이템]**\n"
+                + "\n".join(f"• {o}" for o in items_dict["others"])
+            )
+
+        field_value = "\n\n".join(parts) if parts else "정보 없음"
+        fields.append((f"🌏 {continent}", field_value))
+
+    return fields
+
+
+class MerchantPoller:
+    """
+    korlark 떠돌이 상인 API를 떠상 시간대에 맞춰 주기적으로 조회하고,
+    /떠돌이상인 커맨드가 바로 그릴 수 있는 스냅샷을 메모리에 보관한다.
+    - 시간대가 열린 직후에는 fast_interval마다, 시간이 지날수록 slow_interval까지 간격을 늘린다.
+    - 시간대 밖에서는 다음 시간대 시작까지 잠든다.
+    - 클러스터 모드에서는 리스를 잡은 워커만 API를 호출하고 결과를 bot_state에 올린다.
+      나머지 워커는 그 결과를 읽어 같은 스냅샷을 만든다.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        fast_interval: float,
+        fast_window: float,
+        slow_interval: float,
+        timeout: float,
+    ):
+        self.url = url
+        self.fast_interval = fast_interval
+        self.fast_window = fast_window
+        self.slow_interval = slow_interval
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.snapshot: Optional[MerchantSnapshot] = None
+        self._task: Optional[asyncio.Task] = None
+        self._listeners: list = []
+        self.lease = LeaderLease("merchant_poller")
+        self.state_repository = BotStateRepository(db)
+
+    def add_listener(self, listener: Callable[[MerchantSnapshot], Awaitable[None]]):
+        """
+        스냅샷이 갱신될 때마다 호출될 코루틴 함수를 등록한다.
+        리더가 아닌 워커에서도 호출되므로, 외부로 알림을 보내는 쪽은 self.lease.held를 확인한다.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.lease.release()
+
+    def next_delay(self, now: datetime) -> float:
+        interval_start = get_interval_start(now)
+        if interval_start is None:
+            # 시간대가 열리고 첫 제보가 올라올 틈을 조금 둔다.
+            wait_until = get_next_interval_start(now) + timedelta(
+                seconds=self.fast_interval
+            )
+            return (wait_until - now).total_seconds()
+
+        elapsed = (now - interval_start).total_seconds()
+        delay = min(
+            self.slow_interval,
+            self.fast_interval * 2 ** int(elapsed // self.fast_window),
+        )
+        # 시간대가 끝나는 시점을 넘겨서 자지 않는다.
+        until_end = (get_interval_end(interval_start) - now).total_seconds() + 1
+        return max(1.0, min(delay, until_end))
+
+    async def _run(self):
+        async with aiohttp.ClientSession(
+            timeout=self.timeout, trace_configs=[http_trace_config("korlark")]
+        ) as session:
+            while True:
+                delay = self.next_delay(now_kst())
+                if get_interval_start(now_kst()) is not None:
+                    try:
+                        # 다음 폴링 시점까지 리스를 유지한다. 리더가 죽으면 그 다음 워커가 이어받는다.
+                        if await self.lease.acquire(delay + self.fast_interval):
+                            await self.poll(session)
+                            delay = self.next_delay(now_kst())
+                        else:
+                            await self.load_shared()
+                            delay = min(delay, self.fast_interval)
+                    except Exception:
+                        logger.exception("Merchant poll loop failed")
+                await asyncio.sleep(delay)
+
+    async def poll(self, session: aiohttp.ClientSession):
+        interval_start = get_interval_start(now_kst())
+        if interval_start is None:
+            return
+        try:
+            async with session.get(self.url) as response:
+                if response.status != 200:
+                    logger.warning(
+                        f"Merchant poll failed with status {response.status}"
+                    )
+                    return
+                data = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.warning(f"Merchant poll failed: {e}")
+            return
+
+        merchants = []
+        for m in data.get("merchants", []):
+            created_at_str = m.get("created_at")
+            if created_at_str and _parse_created_at(created_at_str) >= interval_start:
+                merchants.append(m)
+
+        self.snapshot = MerchantSnapshot(
+            interval_start=interval_start,
+            fetched_at=datetime.now(KST),
+            merchants=merchants,
+            fields=build_fields(merchants),
+        )
+        if self.lease.enabled:
+            await self.publish()
+        await self._notify()
+
+    async def publish(self):
+        """현재 스냅샷을 다른 워커가 읽을 수 있게 bot_state에 저장한다."""
+        await self.state_repository.set(
+            SNAPSHOT_KEY,
+            json.dumps(
+                {
+                    "interval_start": self.snapshot.interval_start.isoformat(),
+                    "fetched_at": self.snapshot.fetched_at.isoformat(),
+                    "merchants": self.snapshot.merchants,
+                },
+                ensure_ascii=False,
+            ),
+        )
+
+    async def load_shared(self):
+        """리더가 올린 스냅샷이 가진 것보다 새로우면 그것으로 바꾼다."""
+        value = await self.state_repository.get(SNAPSHOT_KEY)
+        if value is None:
+            return
+        data = json.loads(value)
+        fetched_at = datetime.fromisoformat(data["fetched_at"])
+        if self.snapshot is not None and self.snapshot.fetched_at >= fetched_at:
+            return
+        self.snapshot = MerchantSnapshot(
+            interval_start=datetime.fromisoformat(data["interval_start"]),
+            fetched_at=fetched_at,
+            merchants=data["merchants"],
+            fields=build_fields(data["merchants"]),
+        )
+        await self._notify()
+
+    async def _notify(self):
+        for listener in list(self._listeners):
+            try:
+                await listener(self.snapshot)
+            except Exception:
+                logger.exception("Merchant listener failed")
+
+
+merchant_poller = MerchantPoller(
+    url=settings.KORLARK_MERCHANTS_URL,
+    fast_interval=settings.MERCHANT_FAST_POLL_INTERVAL,
+    fast_window=settings.MERCHANT_FAST_POLL_WINDOW,
+    slow_interval=settings.MERCHANT_SLOW_POLL_INTERVAL,
+    timeout=settings.MERCHANT_POLL_TIMEOUT,
+)
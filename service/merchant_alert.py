@@ -0,0 +1,220 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, NamedTuple, Optional
+
+from utils.logger_config import logger
+
+logger = logger.getChild("service.merchant_alert")
+
+LEGENDARY_RAPPORT = "rapport:legendary"
+HEROIC_RAPPORT = "rapport:heroic"
+ALL_CONTINENTS = ""
+
+_ITEM_ALIASES = {
+    "전설호감도": LEGENDARY_RAPPORT,
+    "전호": LEGENDARY_RAPPORT,
+    "영웅호감도": HEROIC_RAPPORT,
+    "영호": HEROIC_RAPPORT,
+}
+
+# 디스코드 메시지 길이 제한(2000자)보다 여유 있게 자른다.
+MESSAGE_LIMIT = 1900
+MESSAGE_HEADER = "🔔 **떠돌이 상인 알림**"
+# 헤더와 줄바꿈을 붙여도 MESSAGE_LIMIT을 넘지 않는 한 줄의 최대 길이
+LINE_LIMIT = MESSAGE_LIMIT - len(MESSAGE_HEADER) - 1
+
+
+def item_key_for(item: dict) -> str:
+    """떠상 API의 아이템 항목을 구독 키로 변환한다."""
+    content = str(item.get("content", ""))
+    if item.get("type") == 1:  # 호감도
+        if content == "1":
+            return LEGENDARY_RAPPORT
+        if content == "0":
+            return HEROIC_RAPPORT
+    return f"item:{content}"
+
+
+def parse_item_query(text: str) -> str:
+    """사용자가 입력한 아이템 이름을 구독 키로 변환한다."""
+    text = text.strip()
+    return _ITEM_ALIASES.get(text.replace(" ", ""), f"item:{text}")
+
+
+def item_label(item_key: str) -> str:
+    if item_key == LEGENDARY_RAPPORT:
+        return "전설 호감도"
+    if item_key == HEROIC_RAPPORT:
+        return "영웅 호감도"
+    return item_key.split(":", 1)[1]
+
+
+class Subscriber(NamedTuple):
+    id: int
+    discord_id: int
+    channel_id: Optional[int]  # None이면 DM
+
+
+class MerchantAlert(NamedTuple):
+    """한 채널(또는 한 유저 DM)로 보낼 알림 묶음."""
+
+    channel_id: Optional[int]
+    discord_id: Optional[int]
+    lines: list
+
+    def messages(self) -> list:
+        """MESSAGE_LIMIT을 넘지 않도록 나눈 메시지 본문 목록. (각 줄은 LINE_LIMIT 이하)"""
+        messages, current = [], MESSAGE_HEADER
+        for line in self.lines:
+            if (
+                current != MESSAGE_HEADER
+                and len(current) + len(line) + 1 > MESSAGE_LIMIT
+            ):
+                messages.append(current)
+                current = MESSAGE_HEADER
+            current += "\n" + line
+        if current != MESSAGE_HEADER:
+            messages.append(current)
+        return messages
+
+
+def mention_lines(prefix: str, discord_ids: Iterable[int]) -> list:
+    """prefix 뒤에 멘션을 붙이되, 한 줄이 LINE_LIMIT을 넘으면 같은 prefix로 줄을 나눈다."""
+    lines, current = [], prefix
+    for discord_id in discord_ids:
+        mention = f" <@{discord_id}>"
+        if current != prefix and len(current) + len(mention) > LINE_LIMIT:
+            lines.append(current)
+            current = prefix
+        current += mention
+    lines.append(current)
+    return lines
+
+
+class SubscriptionIndex:
+    """
+    item_key -> continent -> 구독 id 집합의 역색인.
+    새 떠상 항목 하나를 매칭하는 비용은 전체 구독 수가 아니라 해당 아이템의 구독 수에 비례한다.
+    """
+
+    def __init__(self):
+        self._subscribers: dict[int, Subscriber] = {}
+        self._keys: dict[int, tuple] = {}
+        self._index: dict = defaultdict(lambda: defaultdict(set))
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def get(self, sub_id: int) -> Subscriber:
+        return self._subscribers[sub_id]
+
+    def add(self, row):
+        """MerchantSubscription 행(또는 같은 속성을 가진 객체)을 추가/갱신한다."""
+        self.remove(row.id)
+        self._subscribers[row.id] = Subscriber(row.id, row.discord_id, row.channel_id)
+        self._keys[row.id] = (row.item_key, row.continent)
+        self._index[row.item_key][row.continent].add(row.id)
+
+    def remove(self, sub_id: int):
+        key = self._keys.pop(sub_id, None)
+        if key is None:
+            return
+        self._subscribers.pop(sub_id, None)
+        item_key, continent = key
+        by_continent = self._index[item_key]
+        by_continent[continent].discard(sub_id)
+        if not by_continent[continent]:
+            del by_continent[continent]
+        if not by_continent:
+            del self._index[item_key]
+
+    def match(self, item_key: str, continent: str) -> Iterable[int]:
+        by_continent = self._index.get(item_key)
+        if not by_continent:
+            return ()
+        return by_continent.get(continent, set()) | by_continent.get(
+            ALL_CONTINENTS, set()
+        )
+
+
+class MerchantAlertService:
+    """
+    폴링된 떠상 스냅샷에서 새로 등록된 항목만 구독과 매칭하고,
+    채널/DM 단위로 묶은 알림을 만든다. 같은 시간대에는 같은 알림을 두 번 보내지 않는다.
+    """
+
+    def __init__(self):
+        self.index = SubscriptionIndex()
+        # 인덱스에 반영된 구독 버전 (MerchantSubscriptionRepository.VERSION_KEY)
+        self.version = 0
+        self._interval: Optional[datetime] = None
+        self._seen_merchants: set = set()
+        self._sent: set = set()
+
+    def load(self, rows: Iterable):
+        for row in rows:
+            self.index.add(row)
+        logger.info(f"Loaded {len(self.index)} merchant subscriptions")
+
+    def apply_changes(self, rows: Iterable, version: int):
+        """
+        다른 워커에서 등록/해지된 구독 행을 인덱스에 반영하고, 반영한 구독 버전을 기록한다.
+        같은 행을 두 번 반영해도 결과는 같다.
+        """
+        changed = 0
+        for row in rows:
+            if row.is_deleted:
+                self.index.remove(row.id)
+            else:
+                self.index.add(row)
+            changed += 1
+        self.version = version
+        logger.debug(f"Applied {changed} merchant subscription changes (v{version})")
+
+    def collect(self, interval_start: datetime, merchants: list) -> list:
+        if interval_start != self._interval:
+            self._interval = interval_start
+            self._seen_merchants.clear()
+            self._sent.clear()
+
+        channel_targets = defaultdict(lambda: defaultdict(set))
+        dm_targets = defaultdict(dict)
+        for m in merchants:
+            merchant_id = m.get("id") or (m.get("continent"), m.get("created_at"))
+            if merchant_id in self._seen_merchants:
+                continue
+            self._seen_merchants.add(merchant_id)
+
+            continent = m.get("continent", "알 수 없음")
+            for it in m.get("items", []):
+                item_key = item_key_for(it)
+                for sub_id in self.index.match(item_key, continent):
+                    dedupe_key = (sub_id, item_key, continent)
+                    if dedupe_key in self._sent:
+                        continue
+                    self._sent.add(dedupe_key)
+
+                    sub = self.index.get(sub_id)
+                    found = (continent, item_label(item_key))
+                    if sub.channel_id is None:
+                        dm_targets[sub.discord_id][found] = None
+                    else:
+                        channel_targets[sub.channel_id][found].add(sub.discord_id)
+
+        alerts = []
+        for channel_id, found_map in channel_targets.items():
+            lines = [
+                line
+                for (continent, label), discord_ids in found_map.items()
+                for line in mention_lines(
+                    f"• **{continent}** {label}:", sorted(discord_ids)
+                )
+            ]
+            alerts.append(MerchantAlert(channel_id, None, lines))
+        for discord_id, found_map in dm_targets.items():
+            lines = [f"• **{continent}** {label}" for continent, label in found_map]
+            alerts.append(MerchantAlert(None, discord_id, lines))
+        return alerts
+
+
+merchant_alerts = MerchantAlertService()
@@ -0,0 +1,149 @@
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional
+
+from repositories.raid_repository import RaidRepository
+from utils.database import db
+from utils.logger_config import logger
+from utils.name_index import PrefixIndex
+
+logger = logger.getChild("service.raid_catalog")
+
+
+class GateInfo(NamedTuple):
+    gate_number: int
+    gold: int
+
+
+class RaidTypeInfo:
+    """레이드 난이도 하나(예: 발탄 노말). 관문 골드 합계(gold)를 미리 계산해 둔다."""
+
+    __slots__ = (
+        "id",
+        "raid_id",
+        "raid_name",
+        "difficulty",
+        "min_item_level",
+        "gates",
+        "gold",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        raid_id: int,
+        raid_name: str,
+        difficulty: str,
+        min_item_level: int,
+        gates: tuple,
+    ):
+        self.id = id
+        self.raid_id = raid_id
+        self.raid_name = raid_name
+        self.difficulty = difficulty
+        self.min_item_level = min_item_level
+        self.gates = gates
+        self.gold = sum(gate.gold for gate in gates)
+
+    def __repr__(self):
+        return f"<RaidTypeInfo {self.raid_name}({self.difficulty}) {self.gold}G>"
+
+
+class RaidInfo:
+    __slots__ = ("id", "name", "types")
+
+    def __init__(self, id: int, name: str, types: tuple):
+        self.id = id
+        self.name = name
+        self.types = types  # RaidTypeInfo, 입장 레벨 순
+
+
+class RaidCatalog:
+    """
+    레이드/난이도/관문 정보를 한 번에 읽어 둔 읽기 전용 스냅샷.
+    id와 (레이드명, 난이도)로 O(1) 조회하며, 변경은 새 스냅샷을 만들어 통째로 교체한다.
+    """
+
+    __slots__ = ("raids", "types", "names", "_raids_by_name", "_types_by_key")
+
+    def __init__(
+        self, raids: Mapping[int, RaidInfo], types: Mapping[int, RaidTypeInfo]
+    ):
+        self.raids = MappingProxyType(dict(raids))
+        self.types = MappingProxyType(dict(types))
+        self._raids_by_name = MappingProxyType({r.name: r for r in raids.values()})
+        # 레이드명 자동완성 (초성 포함)
+        self.names = PrefixIndex()
+        self.names.load((None, name) for name in self._raids_by_name)
+        self._types_by_key = MappingProxyType(
+            {(t.raid_name, t.difficulty): t for t in types.values()}
+        )
+
+    def __len__(self):
+        return len(self.types)
+
+    def get_raid(self, name: str) -> Optional[RaidInfo]:
+        return self._raids_by_name.get(name)
+
+    def get_type(self, raid_name: str, difficulty: str) -> Optional[RaidTypeInfo]:
+        return self._types_by_key.get((raid_name, difficulty))
+
+    @classmethod
+    def from_rows(cls, raid_rows, type_rows, gate_rows) -> "RaidCatalog":
+        """RaidRepository.load_catalog 결과로 만든다."""
+        gates_by_type: dict[int, list] = {}
+        for row in gate_rows:
+            gates_by_type.setdefault(row.raid_type_id, []).append(
+                GateInfo(row.gate_number, row.gold)
+            )
+
+        names = {row.id: row.name for row in raid_rows}
+        types = {}
+        types_by_raid: dict[int, list] = {}
+        for row in type_rows:
+            if row.raid_id not in names:
+                continue
+            info = RaidTypeInfo(
+                id=row.id,
+                raid_id=row.raid_id,
+                raid_name=names[row.raid_id],
+                difficulty=row.difficulty.value,
+                min_item_level=row.min_item_level or 0,
+                gates=tuple(sorted(gates_by_type.get(row.id, ()))),
+            )
+            types[info.id] = info
+            types_by_raid.setdefault(info.raid_id, []).append(info)
+
+        raids = {
+            raid_id: RaidInfo(
+                raid_id,
+                name,
+                tuple(
+                    sorted(
+                        types_by_raid.get(raid_id, ()), key=lambda t: t.min_item_level
+                    )
+                ),
+            )
+            for raid_id, name in names.items()
+        }
+        return cls(raids, types)
+
+
+class RaidCatalogService:
+    """현재 카탈로그 스냅샷을 들고 있다가 reload 시 새 스냅샷으로 참조만 바꾼다."""
+
+    def __init__(self):
+        self.db = db
+        self.raid_repository = RaidRepository(self.db)
+        self.current = RaidCatalog({}, {})
+
+    async def reload(self) -> RaidCatalog:
+        catalog = RaidCatalog.from_rows(*await self.raid_repository.load_catalog())
+        # 조회하는 쪽은 self.current를 한 번 읽어 쓰므로 중간 상태를 보지 않는다.
+        self.current = catalog
+        logger.info(
+            f"Loaded raid catalog: {len(catalog.raids)} raids, {len(catalog)} types"
+        )
+        return catalog
+
+
+raid_catalog = RaidCatalogService()
@@ -0,0 +1,143 @@
+import bisect
+import math
+from datetime import datetime
+from typing import Iterable, NamedTuple, Optional
+
+from service.raid_catalog import RaidTypeInfo
+from utils.logger_config import logger
+
+logger = logger.getChild("service.recruitment_index")
+
+
+class RecruitmentEntry(NamedTuple):
+    id: int
+    raid_name: str
+    difficulty: str
+    min_item_level: Optional[int]
+    end_time: Optional[datetime]
+    max_participants: Optional[int]
+    participant_count: int
+
+    @classmethod
+    def from_row(cls, row, raid_type: RaidTypeInfo) -> "RecruitmentEntry":
+        """RaidRepository.list_open_recruitments 결과 행과 카탈로그의 레이드 종류로 만든다."""
+        return cls(
+            id=row.id,
+            raid_name=raid_type.raid_name,
+            difficulty=raid_type.difficulty,
+            min_item_level=row.min_item_level,
+            end_time=row.end_time,
+            max_participants=row.max_participants,
+            participant_count=row.participant_count,
+        )
+
+    @property
+    def sort_key(self) -> tuple:
+        # 최소 아이템 레벨, 마감 시각 순. 조건/마감이 없으면 각각 가장 낮은/늦은 쪽으로.
+        return (
+            self.min_item_level or 0,
+            self.end_time.timestamp() if self.end_time else math.inf,
+            self.id,
+        )
+
+    @property
+    def is_full(self) -> bool:
+        return (
+            self.max_participants is not None
+            and self.participant_count >= self.max_participants
+        )
+
+
+class RecruitmentIndex:
+    """
+    모집 중(OPEN)인 레이드 모집의 메모리 인덱스.
+    (최소 아이템 레벨, 마감 시각, id) 순으로 정렬된 키 목록을 필터 조합
+    (전체 / 레이드 / 난이도 / 레이드+난이도)마다 따로 유지하므로, 조회는
+    bisect로 참가 가능한 범위를 자른 뒤 필요한 개수만큼만 훑는다.
+    모집이 생성/변경/종료될 때 upsert/remove로 해당 모집만 갱신한다.
+    """
+
+    def __init__(self):
+        self._entries: dict[int, RecruitmentEntry] = {}
+        self._lists: dict[tuple, list] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _filter_keys(entry: RecruitmentEntry) -> tuple:
+        return (
+            (None, None),
+            (entry.raid_name, None),
+            (None, entry.difficulty),
+            (entry.raid_name, entry.difficulty),
+        )
+
+    def load(self, entries: Iterable[RecruitmentEntry]):
+        self._entries.clear()
+        self._lists.clear()
+        for entry in entries:
+            self._entries[entry.id] = entry
+            for filter_key in self._filter_keys(entry):
+                self._lists.setdefault(filter_key, []).append(entry.sort_key)
+        for keys in self._lists.values():
+            keys.sort()
+        logger.info(f"Indexed {len(self._entries)} open recruitments")
+
+    def upsert(self, entry: RecruitmentEntry):
+        self.remove(entry.id)
+        self._entries[entry.id] = entry
+        for filter_key in self._filter_keys(entry):
+            bisect.insort(self._lists.setdefault(filter_key, []), entry.sort_key)
+
+    def remove(self, recruitment_id: int):
+        entry = self._entries.pop(recruitment_id, None)
+        if entry is None:
+            return
+        sort_key = entry.sort_key
+        for filter_key in self._filter_keys(entry):
+            keys = self._lists[filter_key]
+            del keys[bisect.bisect_left(keys, sort_key)]
+            if not keys:
+                del self._lists[filter_key]
+
+    def query(
+        self,
+        item_level: float,
+        raid_name: Optional[str] = None,
+        difficulty: Optional[str] = None,
+        now: Optional[datetime] = None,
+        limit: int = 20,
+    ) -> list:
+        """
+        item_level로 참가할 수 있는 모집을 요구 레벨이 높은 순(같으면 마감이 이른 순)으로
+        최대 limit개 반환한다. 정원이 찼거나 마감 시각이 지난 모집은 건너뛴다.
+        """
+        keys = self._lists.get((raid_name, difficulty))
+        if not keys:
+            return []
+        now_ts = now.timestamp() if now else -math.inf
+
+        # 요구 레벨이 item_level 이하인 구간만 본다.
+        end = bisect.bisect_right(keys, (item_level, math.inf, math.inf))
+        level_end = end
+        results = []
+        while end > 0 and len(results) < limit:
+            # 같은 요구 레벨 묶음은 마감이 이른 순서로 내보낸다.
+            level = keys[end - 1][0]
+            start = bisect.bisect_left(keys, (level,), 0, end)
+            # 이미 마감 시각이 지난 모집은 묶음 앞쪽에 모여 있으므로 bisect로 건너뛴다.
+            live = bisect.bisect_left(keys, (level, now_ts), start, end)
+            for _, _, recruitment_id in keys[live:end]:
+                entry = self._entries[recruitment_id]
+                if entry.is_full:
+                    continue
+                results.append(entry)
+                if len(results) >= limit:
+                    break
+            end = start
+        logger.debug(f"Scanned {level_end - end} of {len(keys)} recruitments")
+        return results
+
+
+recruitment_index = RecruitmentIndex()
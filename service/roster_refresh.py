@@ -0,0 +1,89 @@
+import json
+
+from repositories.bot_state_repository import BotStateRepository
+from repositories.expedition_repository import ExpeditionRepository
+from schemas.user import DiscordUserSchema
+from service.expedition import ExpeditionService
+from service.leader_lease import LeaderLease
+from utils.config import settings
+from utils.database import db
+from utils.logger_config import logger
+from utils.rate_limiter import Priority, RateLimitScheduler
+
+logger = logger.getChild("service.roster_refresh")
+
+CURSOR_KEY = "roster_refresh.cursor"
+
+
+class RosterRefreshService:
+    """
+    저장된 원정대를 오래된 순서로 조금씩 다시 불러와 갱신한다.
+    - 한 번에 batch_size명만 처리하고, API 사용량은 전체 한도의 api_share 비율로 제한한다.
+    - 처리한 위치(stale_at, user_id)를 bot_state에 저장하므로 재시작해도 이어서 진행한다.
+    - 저장은 upsert_expedition의 diff 기반 경로를 그대로 사용한다.
+    - 클러스터 모드에서는 리스를 잡은 워커 하나만 배치를 돌린다.
+    """
+
+    def __init__(self):
+        self.db = db
+        self.expedition_service = ExpeditionService()
+        self.expedition_repository = ExpeditionRepository(self.db)
+        self.state_repository = BotStateRepository(self.db)
+        self.lease = LeaderLease("roster_refresh")
+        # 백그라운드 갱신 전용 예산. 실제 요청은 다시 전역 스케줄러를 거친다.
+        self.budget = RateLimitScheduler(
+            limit=max(
+                1,
+                int(
+                    settings.LOSTARK_API_RATE_LIMIT * settings.ROSTER_REFRESH_API_SHARE
+                ),
+            )
+        )
+
+    async def _load_cursor(self):
+        value = await self.state_repository.get(CURSOR_KEY)
+        return tuple(json.loads(value)) if value else None
+
+    async def run_batch(self) -> int:
+        """가장 오래된 유저 batch_size명을 갱신하고 처리한 인원 수를 반환한다."""
+        # 다음 배치까지 리스를 유지한다. (배치가 길어져도 넘기지 않도록 두 배)
+        if not await self.lease.acquire(settings.ROSTER_REFRESH_INTERVAL * 2):
+            return 0
+        cursor = await self._load_cursor()
+        stale_users = await self.expedition_repository.get_stale_users(
+            settings.ROSTER_REFRESH_MIN_AGE_HOURS,
+            settings.ROSTER_REFRESH_BATCH_SIZE,
+            after=cursor,
+        )
+        if not stale_users:
+            if cursor is not None:
+                # 한 바퀴를 다 돌았으면 처음부터 다시 (실패로 남은 유저 재시도)
+                await self.state_repository.delete(CURSOR_KEY)
+            return 0
+
+        refreshed = 0
+        for row in stale_users:
+            if row.character_name:
+                # siblings 1회 + 서버별 armory 1회
+                for _ in range(1 + row.server_count):
+                    await self.budget.acquire(Priority.BACKGROUND)
+                _, expedition_list = (
+                    await self.expedition_service.get_and_save_expedition(
+                        DiscordUserSchema(
+                            discord_id=row.discord_id,
+                            discord_name=row.discord_name,
+                            discord_avatar=row.discord_avatar,
+                        ),
+                        row.character_name,
+                        register=True,
+                        priority=Priority.BACKGROUND,
+                    )
+                )
+                if expedition_list is not None:
+                    refreshed += 1
+            await self.state_repository.set(
+                CURSOR_KEY, json.dumps([row.stale_at, row.user_id])
+            )
+
+        logger.info(f"Refreshed {refreshed}/{len(stale_users)} stale rosters")
+        return len(stale_users)
@@ -0,0 +1,135 @@
+import bisect
+import heapq
+import time
+from collections import defaultdict
+from typing import Iterable, NamedTuple, Optional
+
+from repositories.expedition_repository import ExpeditionRepository
+from service.raid_catalog import RaidCatalog, RaidTypeInfo, raid_catalog
+from utils.config import settings
+from utils.database import db
+from utils.logger_config import logger
+
+logger = logger.getChild("service.weekly_gold")
+
+
+class CharacterGold(NamedTuple):
+    gold: int
+    item_level: int
+    character_name: str
+
+
+class RosterGold(NamedTuple):
+    discord_id: int
+    discord_name: str
+    total: int
+    characters: tuple  # 골드가 높은 순의 CharacterGold
+
+
+class GoldTable:
+    """
+    레이드 종류(RaidTypeInfo)별 보상을 입장 레벨 오름차순으로 정렬하고,
+    "입장 레벨 기준 앞에서 i개까지 입장 가능"한 캐릭터가 얻을 수 있는 최대 골드
+    (레이드당 가장 비싼 난이도 하나, 최대 raids_per_character개)를 미리 계산해 둔다.
+    캐릭터 하나의 골드는 bisect 한 번으로 구한다.
+    """
+
+    def __init__(self, rewards: Iterable[RaidTypeInfo], raids_per_character: int):
+        rewards = sorted(rewards, key=lambda r: r.min_item_level)
+        self.levels = [r.min_item_level for r in rewards]
+        self.picks: list[tuple] = [()]
+        self.totals: list[int] = [0]
+
+        best_by_raid: dict[str, RaidTypeInfo] = {}
+        for reward in rewards:
+            best = best_by_raid.get(reward.raid_name)
+            if best is None or reward.gold > best.gold:
+                best_by_raid[reward.raid_name] = reward
+            picks = tuple(
+                heapq.nlargest(
+                    raids_per_character, best_by_raid.values(), key=lambda r: r.gold
+                )
+            )
+            self.picks.append(picks)
+            self.totals.append(sum(r.gold for r in picks))
+
+    def _position(self, item_level: float) -> int:
+        return bisect.bisect_right(self.levels, item_level)
+
+    def gold_for(self, item_level: float) -> int:
+        return self.totals[self._position(item_level)]
+
+    def raids_for(self, item_level: float) -> tuple:
+        return self.picks[self._position(item_level)]
+
+
+# 마지막으로 만든 보상표와 그 기준이 된 카탈로그 스냅샷
+_table: Optional[GoldTable] = None
+_table_catalog: Optional[RaidCatalog] = None
+
+
+def compute_rosters(
+    table: GoldTable, rows: Iterable, characters_per_roster: int
+) -> list:
+    """
+    캐릭터 행(discord_id, discord_name, character_name, item_level)을 한 번 훑어
+    유저별 상위 characters_per_roster개 캐릭터의 골드 합을 구하고, 합이 큰 순으로 정렬한다.
+    """
+    by_user = defaultdict(list)
+    names = {}
+    gold_for = table.gold_for
+    for row in rows:
+        by_user[row.discord_id].append(
+            CharacterGold(gold_for(row.item_level), row.item_level, row.character_name)
+        )
+        names[row.discord_id] = row.discord_name
+
+    rosters = []
+    for discord_id, chars in by_user.items():
+        top = tuple(heapq.nlargest(characters_per_roster, chars))
+        rosters.append(
+            RosterGold(discord_id, names[discord_id], sum(c.gold for c in top), top)
+        )
+    rosters.sort(key=lambda r: (-r.total, r.discord_id))
+    return rosters
+
+
+class WeeklyGoldService:
+    def __init__(self):
+        self.db = db
+        self.expedition_repository = ExpeditionRepository(self.db)
+
+    def get_table(self) -> GoldTable:
+        """현재 레이드 카탈로그 스냅샷의 보상표. 카탈로그가 교체되면 새로 만든다."""
+        global _table, _table_catalog
+        catalog = raid_catalog.current
+        if _table_catalog is not catalog:
+            _table = GoldTable(
+                catalog.types.values(), settings.WEEKLY_GOLD_RAIDS_PER_CHARACTER
+            )
+            _table_catalog = catalog
+        return _table
+
+    async def get_roster_gold(self, discord_id: int) -> Optional[RosterGold]:
+        """한 유저의 주간 최대 골드. 등록된 캐릭터가 없으면 None."""
+        rosters = await self._compute(discord_id=discord_id)
+        return rosters[0] if rosters else None
+
+    async def get_report(self, guild_id: int) -> list:
+        """guild_id 서버에서 봇을 사용한 유저들의 주간 최대 골드 순위."""
+        return await self._compute(guild_id=guild_id)
+
+    async def _compute(
+        self, discord_id: Optional[int] = None, guild_id: Optional[int] = None
+    ) -> list:
+        started = time.perf_counter()
+        table = self.get_table()
+        rows = await self.expedition_repository.list_character_levels(
+            discord_id=discord_id, guild_id=guild_id
+        )
+        rosters = compute_rosters(table, rows, settings.WEEKLY_GOLD_CHARACTERS)
+        logger.info(
+            f"Computed weekly gold for {len(rosters)} rosters ({len(rows)} characters) "
+            f"in {(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+        return rosters
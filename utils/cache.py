@@ -0,0 +1,147 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from utils.logger_config import logger
+
+logger = logger.getChild("utils.cache")
+
+
+def normalize_name(name: str) -> str:
+    """캐시 키로 쓰기 위한 캐릭터명 정규화(앞뒤 공백 제거, 대소문자 무시)."""
+    return name.strip().casefold()
+
+
+def estimate_size(value: Any) -> int:
+    """JSON 직렬화 길이로 응답 크기(byte)를 추정한다."""
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires_at", "stale_until")
+
+    def __init__(self, value: Any, size: int, expires_at: float, stale_until: float):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+
+class TTLCache:
+    """
+    엔트리 개수와 전체 byte 크기로 제한되는 TTL + LRU 캐시.
+    TTL이 지난 엔트리는 stale_ttl 동안 그대로 반환하고, 백그라운드에서 갱신한다.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, stale_ttl: float = 0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._refreshing: dict[Hashable, asyncio.Task] = {}
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """만료되지 않은 값만 반환한다. 없거나 만료되었으면 None."""
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        size = estimate_size(value)
+        self.invalidate(key)
+        if size > self.max_bytes:
+            return
+        now = time.monotonic()
+        self._entries[key] = _Entry(value, size, now + ttl, now + ttl + self.stale_ttl)
+        self._bytes += size
+        self._evict()
+
+    def invalidate(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float,
+        fresh: bool = False,
+        refresh_loader: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> Any:
+        """
+        캐시에서 값을 가져오고, 없으면 loader로 불러와 저장한다.
+        stale 구간의 엔트리는 즉시 반환하고 갱신은 백그라운드 태스크로 돌린다.
+        fresh=True면 캐시를 건너뛰고 항상 새로 불러온다.
+        refresh_loader를 주면 백그라운드 갱신에는 loader 대신 그것을 쓴다.
+        """
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and not fresh:
+            if now < entry.expires_at:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry.value
+            if now < entry.stale_until:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                self._schedule_refresh(key, refresh_loader or loader, ttl)
+                return entry.value
+
+        self.misses += 1
+        value = await loader()
+        self.set(key, value, ttl)
+        return value
+
+    def _schedule_refresh(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: float
+    ):
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                self.set(key, await loader(), ttl)
+            except Exception as e:
+                logger.warning(f"Background refresh failed for {key}: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(refresh())
@@ -0,0 +1,51 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+from utils.logger_config import logger
+
+logger = logger.getChild("utils.coalescer")
+
+
+class EditCoalescer:
+    """
+    같은 키에 대한 잦은 갱신 요청을 window초에 최대 한 번의 flush로 합친다.
+    - 쉬고 있던 키의 첫 요청은 바로 flush하고, 이후 window 동안 들어온 요청은 모아서 한 번 더 flush한다.
+    - flush는 호출 시점의 최신 상태를 그리므로, 중간 요청을 건너뛰어도 마지막 상태는 항상 반영된다.
+    """
+
+    def __init__(self, window: float, flush: Callable[[Hashable], Awaitable[None]]):
+        self.window = window
+        self._flush = flush
+        self._dirty: set = set()
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+
+        self.requests = 0
+        self.flushes = 0
+
+    def mark_dirty(self, key: Hashable):
+        self.requests += 1
+        self._dirty.add(key)
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.create_task(self._run(key))
+
+    async def _run(self, key: Hashable):
+        try:
+            while key in self._dirty:
+                self._dirty.discard(key)
+                self.flushes += 1
+                try:
+                    await self._flush(key)
+                except Exception:
+                    logger.exception(f"Flush failed for {key}")
+                # 다음 flush까지 최소 window초를 둔다. 그 사이 요청은 _dirty에 모인다.
+                await asyncio.sleep(self.window)
+        finally:
+            del self._tasks[key]
+
+    async def close(self):
+        """대기 중인 flush를 취소한다."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._dirty.clear()
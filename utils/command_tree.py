@@ -0,0 +1,66 @@
+import time
+
+import discord
+from discord import app_commands
+from discord.utils import utcnow
+
+from utils.logger_config import logger
+from utils.metrics import metrics
+
+logger = logger.getChild("utils.command_tree")
+
+
+def _command_name(interaction: discord.Interaction) -> str:
+    command = interaction.command
+    return command.qualified_name if command is not None else "unknown"
+
+
+class InstrumentedCommandTree(app_commands.CommandTree):
+    """
+    모든 슬래시 커맨드의 처리 시간과 에러 수를 기록하는 커맨드 트리.
+    각 코그의 핸들러를 고치지 않고 Bot(tree_cls=...)로 바꿔 끼운다.
+    - interaction_check: 처리 시작 시각을 interaction.extras에 남긴다.
+    - on_app_command_completion / on_error: 시작 시각부터 걸린 시간을 기록한다.
+    """
+
+    def __init__(self, client, **kwargs):
+        super().__init__(client, **kwargs)
+        client.add_listener(self._on_completion, "on_app_command_completion")
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras["started_at"] = time.perf_counter()
+        if interaction.type is discord.InteractionType.application_command:
+            metrics.observe(
+                "bot_interaction_delay_seconds",
+                max((utcnow() - interaction.created_at).total_seconds(), 0),
+            )
+        return True
+
+    def _observe(self, interaction: discord.Interaction):
+        started_at = interaction.extras.get("started_at")
+        if started_at is not None:
+            metrics.observe(
+                "bot_command_duration_seconds",
+                time.perf_counter() - started_at,
+                command=_command_name(interaction),
+            )
+
+    async def _on_completion(self, interaction: discord.Interaction, command):
+        self._observe(interaction)
+
+    async def on_error(
+        self, interaction: discord.Interaction, error: app_commands.AppCommandError
+    ):
+        self._observe(interaction)
+        # 권한 부족 등 검사 실패는 CheckFailure 하위 클래스로, 핸들러 예외는 원래 예외로 센다.
+        cause = (
+            error.original
+            if isinstance(error, app_commands.CommandInvokeError)
+            else error
+        )
+        metrics.inc(
+            "bot_command_errors_total",
+            command=_command_name(interaction),
+            error=type(cause).__name__,
+        )
+        await super().on_error(interaction, error)
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -5,6 +7,77 @@ class Settings(BaseSettings):
     DISCORD_BOT_TOKEN: str
     LOSTARK_API_KEY: str
     LOG_LEVEL: str = "INFO"
+    LOG_DIR: str = "logs"
+    LOG_RETENTION_DAYS: int = 14  # 회전된 로그 파일 보관 일수
+    LOG_SAMPLE_RATE: float = 5.0  # DEBUG 로그를 호출 위치별로 초당 이만큼만 남긴다
+    LOG_SAMPLE_BURST: int = 20
+
+    # 지표 (/봇상태, Prometheus 텍스트 파일)
+    METRICS_TEXTFILE: Optional[str] = None  # 지정하면 주기적으로 이 경로에 기록
+    METRICS_WRITE_INTERVAL: float = 15.0  # 텍스트 파일 기록 간격(초)
+
+    # 샤딩 / 클러스터 (cluster.py)
+    BOT_SHARDED: bool = False  # AutoShardedBot으로 실행
+    SHARD_COUNT: Optional[int] = None  # 전체 샤드 수 (비우면 디스코드 권장값)
+    # 워커 프로세스 수. 2 이상이면 백그라운드 작업에 리스를 쓴다.
+    CLUSTER_COUNT: int = 1
+    CLUSTER_ID: Optional[int] = None  # 이 워커의 번호 (cluster.py가 설정)
+    CLUSTER_RESTART_DELAY: float = 5.0  # 워커가 죽었을 때 다시 띄우기 전 대기(초)
+
+    # 저장된 원정대 백그라운드 갱신
+    ROSTER_REFRESH_ENABLED: bool = True
+    ROSTER_REFRESH_INTERVAL: float = 300.0  # 배치 사이 간격(초)
+    ROSTER_REFRESH_BATCH_SIZE: int = 20  # 배치당 갱신할 유저 수
+    ROSTER_REFRESH_MIN_AGE_HOURS: float = 24.0  # 이보다 오래된 원정대만 갱신
+    ROSTER_REFRESH_API_SHARE: float = 0.2  # 갱신에 쓸 API 한도 비율
+
+    # 저장된 원정대(/내원정대) 조회 캐시
+    SAVED_EXPEDITION_CACHE_TTL: float = 3600.0
+    SAVED_EXPEDITION_CACHE_MAX_ENTRIES: int = 10000
+    SAVED_EXPEDITION_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+
+    # 원정대 embed 렌더링 캐시 (내용 해시 기준)
+    EXPEDITION_EMBED_CACHE_TTL: float = 3600.0
+    EXPEDITION_EMBED_CACHE_MAX_ENTRIES: int = 5000
+    EXPEDITION_EMBED_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+
+    # 레이드 모집
+    RAID_ROSTER_EDIT_WINDOW: float = 2.0  # 참가자 목록 메시지 수정 최소 간격(초)
+    # 클러스터에서 다른 워커의 카탈로그/모집 변경을 확인하는 간격(초)
+    RAID_STATE_SYNC_INTERVAL: float = 30.0
+    WEEKLY_GOLD_RAIDS_PER_CHARACTER: int = 3  # 캐릭터당 주간 골드 획득 레이드 수
+    WEEKLY_GOLD_CHARACTERS: int = 6  # 원정대당 골드 획득 캐릭터 수
+
+    # 떠돌이 상인 폴링
+    KORLARK_MERCHANTS_URL: str = "https://api.korlark.com/merchants?limit=15&server=1"
+    MERCHANT_FAST_POLL_INTERVAL: float = 60.0  # 시간대가 열린 직후 폴링 간격(초)
+    MERCHANT_FAST_POLL_WINDOW: float = 600.0  # 이 시간(초)마다 폴링 간격을 두 배로
+    MERCHANT_SLOW_POLL_INTERVAL: float = 600.0  # 최대 폴링 간격(초)
+    MERCHANT_POLL_TIMEOUT: float = 10.0
+
+    # SQLite
+    DB_READERS: int = 4  # 읽기 전용 커넥션/스레드 수 (쓰기는 항상 1개)
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # WAL 모드에서는 NORMAL로도 커밋이 안전하다
+    SQLITE_CACHE_SIZE: int = -16000  # 음수면 KiB 단위 (약 16MB)
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_BUSY_TIMEOUT: int = 5000  # 잠금 대기 시간(ms)
+    SQLITE_TEMP_STORE: str = "MEMORY"
+
+    # 로스트아크 API 클라이언트
+    LOSTARK_API_BASE_URL: str = "https://developer-lostark.game.onstove.com"
+    LOSTARK_API_TIMEOUT: float = 10.0  # 요청 전체 타임아웃(초)
+    LOSTARK_API_CONNECT_TIMEOUT: float = 3.0  # 연결 타임아웃(초)
+    LOSTARK_API_POOL_SIZE: int = 20  # 커넥션 풀 최대 연결 수
+    LOSTARK_API_KEEPALIVE: float = 30.0  # keep-alive 유지 시간(초)
+    LOSTARK_API_RATE_LIMIT: int = 100  # API 키의 분당 요청 한도
+    LOSTARK_API_MAX_RETRIES: int = 3  # 429 응답 시 재시도 횟수
+
+    # 로스트아크 API 응답 캐시
+    LOSTARK_SIBLINGS_TTL: float = 300.0  # 원정대(siblings) 응답 TTL(초)
+    LOSTARK_ARMORY_TTL: float = 1800.0  # 아머리 프로필 응답 TTL(초)
+    LOSTARK_CACHE_STALE_TTL: float = 3600.0  # TTL 이후 stale 응답을 허용하는 시간(초)
+    LOSTARK_CACHE_MAX_ENTRIES: int = 5000
+    LOSTARK_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
 
     class Config:
         env_file = ".env"
@@ -1,25 +1,150 @@
+import asyncio
 import os
-from sqlalchemy import create_engine
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 from models import Base
+import models.user, models.expedition, models.raid, models.bot_state, models.merchant  # noqa: F401 (테이블 등록)
 import logging
 
+from utils.config import settings
 from utils.logger_config import logger
+from utils.metrics import metrics
+from utils.migrations import migrate
 
 # DB_PATH = os.path.join(os.path.dirname(__file__), "lostark.db")
 # 루트 디렉토리로 변경
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "lostark.db")
 
 
+def _apply_pragmas(dbapi_connection, connection_record, query_only: bool = False):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT}")
+    cursor.execute(f"PRAGMA temp_store={settings.SQLITE_TEMP_STORE}")
+    if query_only:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+def _instrument(engine: Engine, name: str):
+    """SQL 문장별 실행 시간을 (엔진, 문장 종류) 라벨로 기록한다."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        started_at = conn.info["query_started_at"].pop()
+        metrics.observe(
+            "db_statement_duration_seconds",
+            time.perf_counter() - started_at,
+            engine=name,
+            operation=statement.lstrip().split(None, 1)[0].upper(),
+        )
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        # 실패한 문장은 after_cursor_execute가 불리지 않으므로 시작 시각만 버린다.
+        started = (
+            context.connection.info.get("query_started_at")
+            if context.connection
+            else None
+        )
+        if started:
+            started.pop()
+
+
 class Database:
-    def __init__(self):
-        self.engine = create_engine(
-            f"sqlite:///{DB_PATH}",
+    """
+    프로세스 전체에서 공유하는 엔진/세션 팩토리. 직접 생성하지 말고 `db`를 import해서 사용한다.
+    - 쓰기: 커넥션 1개 + 스레드 1개로 직렬화된 writer 엔진
+    - 읽기: 여러 커넥션을 가진 reader 엔진. WAL 모드라 쓰기 트랜잭션 뒤에서 기다리지 않는다.
+    동기 SQLAlchemy 호출은 모두 전용 스레드 풀에서 실행되어 디스코드 이벤트 루프를 막지 않는다.
+    """
+
+    def __init__(self, path: str = DB_PATH):
+        url = f"sqlite:///{path}"
+        self.engine = self._create_engine(url, pool_size=1)
+        self.reader_engine = self._create_engine(
+            url, pool_size=settings.DB_READERS, query_only=True
+        )
+        _instrument(self.engine, "writer")
+        _instrument(self.reader_engine, "reader")
+        self.Session = sessionmaker(bind=self.engine)
+        self.ReadSession = sessionmaker(bind=self.reader_engine)
+
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self._readers = ThreadPoolExecutor(
+            max_workers=settings.DB_READERS, thread_name_prefix="db-reader"
+        )
+
+    @staticmethod
+    def _create_engine(url: str, pool_size: int, query_only: bool = False) -> Engine:
+        engine = create_engine(
+            url,
             echo=False,
+            pool_size=pool_size,
+            max_overflow=0,
             connect_args={"check_same_thread": False},
         )
-        self.Session = sessionmaker(bind=self.engine)
+        event.listen(engine, "connect", partial(_apply_pragmas, query_only=query_only))
+        return engine
+
+    async def write(self, fn: Callable[..., Any], *args) -> Any:
+        """
+        fn(session, *args)를 writer 스레드에서 실행하고 결과를 기다린다.
+        세션은 호출마다 열고 닫으며, 커밋은 fn이 직접 한다.
+        """
+        return await self._run(self._writer, self.Session, fn, *args)
+
+    async def read(self, fn: Callable[..., Any], *args) -> Any:
+        """fn(session, *args)를 reader 스레드에서 읽기 전용 세션으로 실행한다."""
+        return await self._run(self._readers, self.ReadSession, fn, *args)
+
+    async def _run(self, executor, session_factory, fn, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, partial(self._run_in_session, session_factory, fn, *args)
+        )
+
+    @staticmethod
+    def _run_in_session(session_factory, fn: Callable[..., Any], *args) -> Any:
+        with session_factory() as session:
+            return fn(session, *args)
+
+    async def create_all(self):
+        """테이블을 만들고 대기 중인 마이그레이션을 적용한다."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._writer, self.setup_schema)
+
+    def setup_schema(self):
+        # 테이블마다 존재 여부를 확인하는 대신 sqlite_master 한 번으로 없는 테이블만 만든다.
+        existing = set(inspect(self.engine).get_table_names())
+        missing = [
+            table for table in Base.metadata.sorted_tables if table.name not in existing
+        ]
+        if missing:
+            logger.info(f"Creating tables: {', '.join(t.name for t in missing)}")
+            Base.metadata.create_all(self.engine, tables=missing)
+        # create_all은 이미 존재하는 테이블에 인덱스/컬럼을 추가하지 않으므로 마이그레이션으로 처리
+        for migration in migrate(self.engine):
+            logger.info(f"Applied migration {migration.version}")
+
+    def dispose(self):
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        self.engine.dispose()
+        self.reader_engine.dispose()
+
 
-    def create_all(self):
-        logger.info("Creating all tables")
-        Base.metadata.create_all(self.engine)
+db = Database()
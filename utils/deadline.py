@@ -0,0 +1,96 @@
+import asyncio
+import heapq
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Hashable, Iterable, Optional
+
+from utils.logger_config import logger
+
+logger = logger.getChild("utils.deadline")
+
+
+class DeadlineScheduler:
+    """
+    키별 마감 시각을 최소 힙으로 들고 있다가, 가장 이른 마감까지 잠들어 있다가 깨어나
+    그때까지 지난 키들을 한 번에 expire로 넘긴다.
+    - 마감이 바뀌거나 취소되면 힙에서 지우지 않고 _deadlines만 고친다. 낡은 힙 항목은 꺼낼 때 버린다.
+    - 지금 기다리는 마감보다 이른 마감이 들어오면 루프를 깨워 다시 잠들 시간을 계산한다.
+    """
+
+    def __init__(self, expire: Callable[[list], Awaitable[None]]):
+        self._expire = expire
+        self._heap: list = []  # (마감 timestamp, 키)
+        self._deadlines: dict[Hashable, float] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.expired = 0
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def load(self, items: Iterable[tuple[Hashable, datetime]]):
+        """(키, 마감 시각) 목록으로 힙을 새로 만든다."""
+        self._deadlines = {key: when.timestamp() for key, when in items}
+        self._heap = [(ts, key) for key, ts in self._deadlines.items()]
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+        logger.info(f"Loaded {len(self._heap)} deadlines")
+
+    def schedule(self, key: Hashable, when: Optional[datetime]):
+        """key의 마감을 when으로 바꾼다. when이 None이면 취소한다."""
+        if when is None:
+            self.cancel(key)
+            return
+        ts = when.timestamp()
+        self._deadlines[key] = ts
+        heapq.heappush(self._heap, (ts, key))
+        if self._heap[0] == (ts, key):
+            self._wakeup.set()
+
+    def cancel(self, key: Hashable):
+        self._deadlines.pop(key, None)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _pop_due(self, now: float) -> tuple[list, Optional[float]]:
+        """now까지 지난 키 목록과 다음 마감 timestamp를 반환한다."""
+        due = []
+        while self._heap:
+            ts, key = self._heap[0]
+            if self._deadlines.get(key) != ts:
+                heapq.heappop(self._heap)  # 취소되었거나 바뀐 마감
+            elif ts <= now:
+                heapq.heappop(self._heap)
+                del self._deadlines[key]
+                due.append(key)
+            else:
+                return due, ts
+        return due, None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            due, next_ts = self._pop_due(time.time())
+            if due:
+                self.expired += len(due)
+                try:
+                    await self._expire(due)
+                except Exception:
+                    logger.exception(f"Expire failed for {len(due)} keys")
+                continue
+
+            # 다음 마감까지(없으면 새 마감이 들어올 때까지) 잠든다.
+            timeout = None if next_ts is None else max(next_ts - time.time(), 0)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -1,6 +1,9 @@
+import atexit
 import logging
 import os
-from datetime import datetime
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
 
 from utils.config import settings
 
@@ -8,27 +11,87 @@ LOG_LEVEL = settings.LOG_LEVEL
 LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
 
 
+class SamplingFilter(logging.Filter):
+    """
+    max_level 이하(기본 DEBUG) 로그를 호출 위치별로 초당 rate개까지만 통과시킨다. (토큰 버킷, 최대 burst개)
+    버려진 줄 수는 다음에 통과하는 줄 뒤에 붙여서 알린다. WARNING 이상은 항상 통과한다.
+    """
+
+    def __init__(self, rate: float, burst: int, max_level: int = logging.DEBUG):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.max_level = max_level
+        # (경로, 줄 번호) -> [남은 토큰, 마지막 갱신 시각, 버린 줄 수]
+        self._buckets: dict = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(self.burst), now, 0]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] < 1:
+            bucket[2] += 1
+            return False
+        bucket[0] -= 1
+        if bucket[2]:
+            record.msg = f"{record.msg} (같은 위치 로그 {bucket[2]}건 생략)"
+            bucket[2] = 0
+        return True
+
+
+def _log_path() -> str:
+    # 클러스터 워커는 파일 회전이 겹치지 않도록 각자 파일을 쓴다.
+    if settings.CLUSTER_ID is not None:
+        return os.path.join(settings.LOG_DIR, f"bot-{settings.CLUSTER_ID}.log")
+    return os.path.join(settings.LOG_DIR, "bot.log")
+
+
 # 로거 초기화 함수
 def init_logger():
+    """
+    루트 로거에는 큐에 넣기만 하는 QueueHandler를 달고, 실제 콘솔/파일 출력은
+    QueueListener의 백그라운드 스레드가 한다. 이벤트 루프에서 디스크 I/O를 하지 않는다.
+    """
     logger = logging.getLogger()
     logger.setLevel(LOG_LEVEL)
+    formatter = logging.Formatter(LOG_FORMAT)
 
     # 콘솔 핸들러
     console_handler = logging.StreamHandler()
     console_handler.setLevel(LOG_LEVEL)
-    console_formatter = logging.Formatter(LOG_FORMAT)
-    console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
-
-    # 파일 핸들러 (logs 디렉토리가 없는 경우 생성)
-    if not os.path.exists("logs"):
-        os.makedirs("logs")
-    today = datetime.today().strftime("%Y%m%d")
-    file_handler = logging.FileHandler(f"logs/{today}-bot.log", encoding="utf-8")
+    console_handler.setFormatter(formatter)
+
+    # 파일 핸들러: 자정마다 bot.log.YYYY-MM-DD로 넘기고 LOG_RETENTION_DAYS일치만 남긴다.
+    os.makedirs(settings.LOG_DIR, exist_ok=True)
+    file_handler = TimedRotatingFileHandler(
+        _log_path(),
+        when="midnight",
+        backupCount=settings.LOG_RETENTION_DAYS,
+        encoding="utf-8",
+    )
     file_handler.setLevel(LOG_LEVEL)
-    file_formatter = logging.Formatter(LOG_FORMAT)
-    file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
+    file_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(
+        SamplingFilter(settings.LOG_SAMPLE_RATE, settings.LOG_SAMPLE_BURST)
+    )
+    logger.addHandler(queue_handler)
+
+    listener = QueueListener(
+        log_queue, console_handler, file_handler, respect_handler_level=True
+    )
+    listener.start()
+    # 종료 시 큐에 남은 로그를 마저 쓴다.
+    atexit.register(listener.stop)
 
     return logger
 
@@ -0,0 +1,204 @@
+import asyncio
+import time
+from typing import Any, Optional
+from urllib.parse import quote
+
+import aiohttp
+
+from utils.cache import TTLCache, normalize_name
+from utils.config import settings
+from utils.logger_config import logger
+from utils.metrics import http_trace_config, metrics
+from utils.rate_limiter import Priority, RateLimitScheduler
+from utils.singleflight import SingleFlight
+
+logger = logger.getChild("utils.lostark_api")
+
+
+class LostArkAPIError(Exception):
+    """로스트아크 API 호출 실패(비정상 응답 코드, 파싱 실패, 타임아웃 등)."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class LostArkClient:
+    """
+    로스트아크 개발자 API 비동기 클라이언트.
+    하나의 keep-alive 커넥션 풀(aiohttp.ClientSession)을 프로세스 전체에서 공유한다.
+    세션은 이벤트 루프 안에서 처음 요청할 때 생성한다.
+    모든 요청은 scheduler를 거쳐 API 키의 요청 한도 안에서 나간다.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        timeout: float,
+        connect_timeout: float,
+        pool_size: int,
+        keepalive: float,
+        scheduler: RateLimitScheduler,
+        max_retries: int,
+        cache: TTLCache,
+        siblings_ttl: float,
+        armory_ttl: float,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.scheduler = scheduler
+        self.max_retries = max_retries
+        self.cache = cache
+        self.siblings_ttl = siblings_ttl
+        self.armory_ttl = armory_ttl
+        self._flight = SingleFlight()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size, keepalive_timeout=self.keepalive
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers={
+                    "accept": "application/json",
+                    "authorization": f"Bearer {self.api_key}",
+                },
+                trace_configs=[http_trace_config("lostark")],
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _get_json(
+        self,
+        path: str,
+        params: Optional[dict] = None,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> Any:
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.max_retries + 1):
+            await self.scheduler.acquire(priority)
+            try:
+                async with self._get_session().get(url, params=params) as response:
+                    self.scheduler.update_from_headers(response.headers)
+                    if response.status == 429 and attempt < self.max_retries:
+                        self.scheduler.penalize(_retry_after(response.headers))
+                        metrics.inc("lostark_api_retries_total")
+                        continue
+                    if response.status != 200:
+                        raise LostArkAPIError(
+                            f"GET {path} failed with status {response.status}",
+                            status=response.status,
+                        )
+                    return await response.json(content_type=None)
+            except asyncio.TimeoutError as e:
+                raise LostArkAPIError(f"GET {path} timed out") from e
+            except (aiohttp.ClientError, ValueError) as e:
+                raise LostArkAPIError(f"GET {path} failed: {e}") from e
+
+    async def _cached_get(
+        self,
+        endpoint: str,
+        character_name: str,
+        path: str,
+        params: Optional[dict],
+        ttl: float,
+        fresh: bool,
+        priority: Priority,
+    ) -> Any:
+        """
+        (endpoint, 정규화된 캐릭터명) 단위로 캐시하고, 동시에 들어온 같은 요청은
+        하나의 API 호출로 합친다.
+        """
+        key = (endpoint, normalize_name(character_name))
+
+        def loader(p: Priority):
+            return lambda: self._flight.do(
+                key, lambda: self._get_json(path, params, priority=p)
+            )
+
+        return await self.cache.get_or_load(
+            key,
+            loader(priority),
+            ttl=ttl,
+            fresh=fresh,
+            refresh_loader=loader(Priority.BACKGROUND),
+        )
+
+    async def get_siblings(
+        self,
+        character_name: str,
+        fresh: bool = False,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> Any:
+        """캐릭터의 원정대(전 서버 보유 캐릭터) 목록 조회."""
+        return await self._cached_get(
+            "siblings",
+            character_name,
+            f"/characters/{quote(character_name, safe='')}/siblings",
+            None,
+            self.siblings_ttl,
+            fresh,
+            priority,
+        )
+
+    async def get_armory_profile(
+        self,
+        character_name: str,
+        fresh: bool = False,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> Any:
+        """캐릭터 아머리 프로필 조회. 원정대 레벨과 캐릭터 이미지만 사용한다."""
+        return await self._cached_get(
+            "armory",
+            character_name,
+            f"/armories/characters/{quote(character_name, safe='')}",
+            {"filters": "profiles"},
+            self.armory_ttl,
+            fresh,
+            priority,
+        )
+
+
+def _retry_after(headers) -> float:
+    """429 응답의 Retry-After(초) 또는 X-RateLimit-Reset(epoch)으로 대기 시간을 구한다."""
+    try:
+        return float(headers["Retry-After"])
+    except (KeyError, ValueError):
+        pass
+    try:
+        return max(1.0, float(headers["X-RateLimit-Reset"]) - time.time())
+    except (KeyError, ValueError):
+        return 1.0
+
+
+lostark_client = LostArkClient(
+    api_key=settings.LOSTARK_API_KEY,
+    base_url=settings.LOSTARK_API_BASE_URL,
+    timeout=settings.LOSTARK_API_TIMEOUT,
+    connect_timeout=settings.LOSTARK_API_CONNECT_TIMEOUT,
+    pool_size=settings.LOSTARK_API_POOL_SIZE,
+    keepalive=settings.LOSTARK_API_KEEPALIVE,
+    # 같은 API 키를 쓰는 워커들이 한도를 나눠 쓴다.
+    scheduler=RateLimitScheduler(
+        limit=settings.LOSTARK_API_RATE_LIMIT, share=1 / settings.CLUSTER_COUNT
+    ),
+    max_retries=settings.LOSTARK_API_MAX_RETRIES,
+    cache=TTLCache(
+        max_entries=settings.LOSTARK_CACHE_MAX_ENTRIES,
+        max_bytes=settings.LOSTARK_CACHE_MAX_BYTES,
+        stale_ttl=settings.LOSTARK_CACHE_STALE_TTL,
+    ),
+    siblings_ttl=settings.LOSTARK_SIBLINGS_TTL,
+    armory_ttl=settings.LOSTARK_ARMORY_TTL,
+)
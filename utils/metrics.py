@@ -0,0 +1,199 @@
+import bisect
+import os
+import threading
+import time
+from typing import Optional
+
+import aiohttp
+
+# 지연 시간 히스토그램 버킷(초)
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Histogram:
+    """고정 버킷 히스토그램. 버킷별 개수와 합계만 들고 있어 관측 한 번이 O(log 버킷 수)다."""
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 마지막 칸은 +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """q 분위수가 들어 있는 버킷의 상한. (마지막 버킷이면 가장 큰 유한 상한)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            cumulative += n
+            if cumulative >= target:
+                return self.buckets[min(i, len(self.buckets) - 1)]
+        return self.buckets[-1]
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class MetricsRegistry:
+    """
+    프로세스 안에서 모으는 카운터/히스토그램. 지표는 (이름, 라벨) 조합마다 하나씩 생긴다.
+    DB 스레드에서도 기록하므로 갱신은 lock 안에서 한다.
+    /봇상태가 바로 읽고, write_textfile로 Prometheus 텍스트 형식 파일을 쓴다.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._counters: dict[tuple, float] = {}
+        self._histograms: dict[tuple, Histogram] = {}
+        self._help: dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def counters(self, name: str) -> list:
+        """[(라벨 dict, 값)]"""
+        with self._lock:
+            return [
+                (dict(labels), value)
+                for (metric, labels), value in self._counters.items()
+                if metric == name
+            ]
+
+    def histograms(self, name: str) -> list:
+        """[(라벨 dict, Histogram)]"""
+        with self._lock:
+            return [
+                (dict(labels), histogram)
+                for (metric, labels), histogram in self._histograms.items()
+                if metric == name
+            ]
+
+    def render(self) -> str:
+        """Prometheus 텍스트 노출 형식."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (list(h.counts), h.count, h.sum, h.buckets))
+                for key, h in self._histograms.items()
+            )
+
+        lines = []
+        declared = set()
+
+        def declare(name: str, kind: str):
+            if name in declared:
+                return
+            declared.add(name)
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            declare(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for (name, labels), (counts, count, total, buckets) in histograms:
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, n in zip((*buckets, "+Inf"), counts):
+                cumulative += n
+                bucket_labels = _format_labels((*labels, ("le", bound)))
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        lines.append(f"process_start_time_seconds {self.started_at}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str):
+        """node_exporter textfile collector가 읽을 수 있게 임시 파일에 쓴 뒤 교체한다."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+metrics = MetricsRegistry()
+metrics.describe("bot_command_duration_seconds", "Slash command handling time")
+metrics.describe("bot_command_errors_total", "Slash commands that raised an error")
+metrics.describe(
+    "bot_interaction_delay_seconds", "Time from interaction creation to dispatch"
+)
+metrics.describe("http_client_request_duration_seconds", "Outbound HTTP request time")
+metrics.describe("http_client_requests_total", "Outbound HTTP requests by status")
+metrics.describe("lostark_api_retries_total", "Lost Ark API requests retried on 429")
+metrics.describe("db_statement_duration_seconds", "SQL statement execution time")
+
+
+def http_trace_config(service: str) -> aiohttp.TraceConfig:
+    """aiohttp 세션에 붙이면 service 라벨로 요청 시간과 응답 코드를 기록한다."""
+
+    async def on_request_start(session, context, params):
+        context.started_at = time.perf_counter()
+
+    async def on_request_end(session, context, params):
+        _record_request(service, context, str(params.response.status))
+
+    async def on_request_exception(session, context, params):
+        _record_request(service, context, type(params.exception).__name__)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
+
+
+def _record_request(service: str, context, status: str):
+    started_at: Optional[float] = getattr(context, "started_at", None)
+    if started_at is not None:
+        metrics.observe(
+            "http_client_request_duration_seconds",
+            time.perf_counter() - started_at,
+            service=service,
+        )
+    metrics.inc("http_client_requests_total", service=service, status=status)
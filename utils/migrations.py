@@ -0,0 +1,260 @@
+"""
+버전 테이블 기반의 간단한 스키마 마이그레이션.
+
+Base.metadata.create_all은 없는 테이블만 만들기 때문에, 이미 존재하는 lostark.db에
+인덱스나 컬럼을 추가하려면 여기에 마이그레이션을 순서대로 추가한다.
+적용된 버전은 schema_migrations 테이블에 기록되며, 시작 시 남은 마이그레이션만 실행된다.
+
+    python -m utils.migrations --plan   # 적용 대기 중인 작업 출력
+    python -m utils.migrations          # 적용
+"""
+
+import argparse
+from typing import NamedTuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from utils.logger_config import logger
+
+logger = logger.getChild("utils.migrations")
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    statements: tuple
+
+
+class AddColumn(NamedTuple):
+    """
+    컬럼 추가. create_all로 새로 만든 테이블에는 이미 컬럼이 있으므로
+    (SQLite에는 ADD COLUMN IF NOT EXISTS가 없어서) 없을 때만 실행한다.
+    """
+
+    table: str
+    column: str
+    definition: str
+
+    def __str__(self):
+        return f"ALTER TABLE {self.table} ADD COLUMN {self.column} {self.definition}"
+
+    def apply(self, conn):
+        columns = {
+            row[1] for row in conn.execute(text(f"PRAGMA table_info({self.table})"))
+        }
+        if self.column not in columns:
+            conn.execute(text(str(self)))
+
+
+MIGRATIONS = [
+    Migration(
+        1,
+        "roster lookup indexes",
+        (
+            # 같은 (user_id, server_name) 원정대가 여럿이면 가장 최근 행만 남긴다.
+            # 지울 원정대의 캐릭터는 남는 원정대로 옮긴 뒤, 아래에서 캐릭터 중복과 함께 정리한다.
+            """
+            UPDATE expedition_characters SET expedition_id = (
+                SELECT MAX(e2.id) FROM expeditions e1
+                JOIN expeditions e2
+                  ON e2.user_id = e1.user_id AND e2.server_name = e1.server_name
+                WHERE e1.id = expedition_characters.expedition_id
+            )
+            WHERE expedition_id IN (
+                SELECT id FROM expeditions WHERE id NOT IN (
+                    SELECT MAX(id) FROM expeditions GROUP BY user_id, server_name
+                )
+            )
+            """,
+            """
+            DELETE FROM expeditions WHERE id NOT IN (
+                SELECT MAX(id) FROM expeditions GROUP BY user_id, server_name
+            )
+            """,
+            # 유니크 인덱스 생성 전에 중복 캐릭터 행 정리 (가장 최근 행만 남김)
+            """
+            DELETE FROM expedition_characters WHERE id NOT IN (
+                SELECT MAX(id) FROM expedition_characters
+                GROUP BY expedition_id, character_name
+            )
+            """,
+            # expeditions.user_id, expedition_characters.expedition_id 단독 조회도
+            # 아래 복합 유니크 인덱스의 선두 컬럼으로 처리된다.
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_expeditions_user_server "
+            "ON expeditions (user_id, server_name)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_expedition_characters_expedition_name "
+            "ON expedition_characters (expedition_id, character_name)",
+            "CREATE INDEX IF NOT EXISTS ix_expedition_characters_character_name "
+            "ON expedition_characters (character_name)",
+            # users.discord_id는 UNIQUE 제약의 자동 인덱스가 이미 있다.
+        ),
+    ),
+    Migration(
+        2,
+        "partial indexes on active rows",
+        (
+            "CREATE INDEX IF NOT EXISTS ix_expeditions_user_active "
+            "ON expeditions (user_id) WHERE is_deleted = 0",
+            "CREATE INDEX IF NOT EXISTS ix_expedition_characters_expedition_active "
+            "ON expedition_characters (expedition_id) WHERE is_deleted = 0",
+            "CREATE INDEX IF NOT EXISTS ix_raid_participants_recruitment_active "
+            "ON raid_participants (raid_recruitment_id) WHERE is_deleted = 0",
+        ),
+    ),
+    Migration(
+        3,
+        "unique raid participant pairs",
+        (
+            """
+            DELETE FROM raid_participants WHERE id NOT IN (
+                SELECT MAX(id) FROM raid_participants
+                GROUP BY raid_recruitment_id, user_id
+            )
+            """,
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_raid_participants_recruitment_user "
+            "ON raid_participants (raid_recruitment_id, user_id)",
+        ),
+    ),
+    Migration(
+        4,
+        "raid recruitment participant counter",
+        (
+            AddColumn(
+                "raid_recruitments",
+                "participant_count",
+                "INTEGER NOT NULL DEFAULT 0",
+            ),
+            """
+            UPDATE raid_recruitments SET participant_count = (
+                SELECT COUNT(*) FROM raid_participants
+                WHERE raid_participants.raid_recruitment_id = raid_recruitments.id
+                  AND raid_participants.is_deleted = 0
+            )
+            """,
+        ),
+    ),
+    Migration(
+        5,
+        "raid recruitment message location",
+        (
+            AddColumn("raid_recruitments", "channel_id", "INTEGER"),
+            AddColumn("raid_recruitments", "message_id", "INTEGER"),
+        ),
+    ),
+    Migration(
+        6,
+        "raid type entry item level",
+        (AddColumn("raid_types", "min_item_level", "INTEGER"),),
+    ),
+    Migration(
+        7,
+        "raid recruitment guild",
+        (AddColumn("raid_recruitments", "guild_id", "INTEGER"),),
+    ),
+    Migration(
+        8,
+        "merchant subscription version",
+        (
+            AddColumn(
+                "merchant_subscriptions", "version", "INTEGER NOT NULL DEFAULT 0"
+            ),
+            "CREATE INDEX IF NOT EXISTS ix_merchant_subscriptions_version "
+            "ON merchant_subscriptions (version)",
+        ),
+    ),
+    Migration(
+        9,
+        "raid recruitment version",
+        (
+            AddColumn("raid_recruitments", "version", "INTEGER NOT NULL DEFAULT 0"),
+            "CREATE INDEX IF NOT EXISTS ix_raid_recruitments_version "
+            "ON raid_recruitments (version)",
+        ),
+    ),
+]
+
+
+def _ensure_version_table(conn):
+    conn.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+    )
+
+
+def pending_migrations(engine: Engine) -> list:
+    """아직 적용되지 않은 마이그레이션 목록. DB에는 아무것도 쓰지 않는다."""
+    with engine.connect() as conn:
+        has_table = conn.execute(
+            text(
+                "SELECT 1 FROM sqlite_master "
+                "WHERE type = 'table' AND name = 'schema_migrations'"
+            )
+        ).first()
+        applied = (
+            {
+                row[0]
+                for row in conn.execute(text("SELECT version FROM schema_migrations"))
+            }
+            if has_table
+            else set()
+        )
+    return [m for m in sorted(MIGRATIONS) if m.version not in applied]
+
+
+def migrate(engine: Engine) -> list:
+    """대기 중인 마이그레이션을 버전 순서대로 각각 하나의 트랜잭션으로 적용한다."""
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+    applied = []
+    for migration in pending_migrations(engine):
+        logger.info(f"Applying migration {migration.version}: {migration.description}")
+        with engine.begin() as conn:
+            for statement in migration.statements:
+                if isinstance(statement, AddColumn):
+                    statement.apply(conn)
+                else:
+                    conn.execute(text(statement))
+            conn.execute(
+                text(
+                    "INSERT INTO schema_migrations (version, description) "
+                    "VALUES (:version, :description)"
+                ),
+                {"version": migration.version, "description": migration.description},
+            )
+        applied.append(migration)
+    return applied
+
+
+def main():
+    from utils.database import db
+
+    parser = argparse.ArgumentParser(description="lostark.db 스키마 마이그레이션")
+    parser.add_argument(
+        "--plan", action="store_true", help="적용하지 않고 대기 중인 작업만 출력"
+    )
+    args = parser.parse_args()
+
+    migrations = pending_migrations(db.engine)
+    if not migrations:
+        print("No pending migrations.")
+        return
+    for migration in migrations:
+        print(f"[{migration.version}] {migration.description}")
+        if args.plan:
+            for statement in migration.statements:
+                print("    " + " ".join(str(statement).split()) + ";")
+    if not args.plan:
+        db.setup_schema()
+        print(f"Applied {len(migrations)} migrations.")
+
+
+if __name__ == "__main__":
+    main()
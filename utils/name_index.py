@@ -0,0 +1,122 @@
+import bisect
+from collections import Counter
+from typing import Iterable, Optional
+
+from utils.cache import normalize_name
+
+# 한글 음절의 초성 (유니코드 순서)
+CHOSUNG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+_HANGUL_START, _HANGUL_END = 0xAC00, 0xD7A3
+_JAMO_START, _JAMO_END = 0x3131, 0x314E  # 호환용 자모 자음
+
+
+def to_chosung(text: str) -> str:
+    """한글 음절은 초성으로 바꾸고 나머지 글자는 정규화해서 그대로 둔다. (예: 홍길동 -> ㅎㄱㄷ)"""
+    result = []
+    for ch in normalize_name(text):
+        code = ord(ch)
+        if _HANGUL_START <= code <= _HANGUL_END:
+            result.append(CHOSUNG[(code - _HANGUL_START) // 588])
+        else:
+            result.append(ch)
+    return "".join(result)
+
+
+def has_jamo(text: str) -> bool:
+    return any(_JAMO_START <= ord(ch) <= _JAMO_END for ch in text)
+
+
+def _scan(keys: list, prefix: str, limit: int, seen: set) -> list:
+    """정렬된 (key, name) 목록에서 key가 prefix로 시작하는 이름을 limit개까지 찾는다."""
+    results = []
+    i = bisect.bisect_left(keys, (prefix,))
+    while i < len(keys) and len(results) < limit:
+        key, name = keys[i]
+        if not key.startswith(prefix):
+            break
+        if name not in seen:
+            seen.add(name)
+            results.append(name)
+        i += 1
+    return results
+
+
+class PrefixIndex:
+    """
+    자동완성용 이름 접두사 인덱스.
+    정규화한 이름과 초성 문자열을 각각 정렬된 목록으로 들고 있어, 검색은 bisect 한 번과
+    결과 개수만큼의 순회로 끝난다. 입력에 자음(ㄱ, ㄴ, ...)이 섞여 있으면 초성으로 비교한다.
+    이름별로 소유자(discord_id)를 기록해 두고, 검색한 유저의 이름을 먼저 보여준다.
+    """
+
+    def __init__(self):
+        self._keys: list = []  # (정규화한 이름, 이름)
+        self._chosung_keys: list = []  # (초성, 이름)
+        self._refs: Counter = Counter()
+        self._owned: dict[int, set] = {}
+
+    def __len__(self):
+        return len(self._refs)
+
+    def add(self, name: str):
+        self._refs[name] += 1
+        if self._refs[name] == 1:
+            bisect.insort(self._keys, (normalize_name(name), name))
+            bisect.insort(self._chosung_keys, (to_chosung(name), name))
+
+    def remove(self, name: str):
+        if self._refs[name] > 1:
+            self._refs[name] -= 1
+            return
+        if self._refs.pop(name, None) is None:
+            return
+        for keys, key in (
+            (self._keys, normalize_name(name)),
+            (self._chosung_keys, to_chosung(name)),
+        ):
+            i = bisect.bisect_left(keys, (key, name))
+            if i < len(keys) and keys[i] == (key, name):
+                del keys[i]
+
+    def load(self, rows: Iterable):
+        """(owner, name) 목록으로 인덱스를 새로 만든다. owner가 없으면 None."""
+        self._refs.clear()
+        self._owned.clear()
+        for owner, name in rows:
+            self._refs[name] += 1
+            if owner is not None:
+                self._owned.setdefault(owner, set()).add(name)
+        self._keys = sorted((normalize_name(name), name) for name in self._refs)
+        self._chosung_keys = sorted((to_chosung(name), name) for name in self._refs)
+
+    def set_owned(self, owner: int, names: Iterable[str]):
+        """owner의 이름 목록을 교체하고, 바뀐 이름만 인덱스에 반영한다."""
+        names = set(names)
+        previous = self._owned.get(owner, set())
+        for name in previous - names:
+            self.remove(name)
+        for name in names - previous:
+            self.add(name)
+        if names:
+            self._owned[owner] = names
+        else:
+            self._owned.pop(owner, None)
+
+    def search(self, query: str, owner: Optional[int] = None, limit: int = 25) -> list:
+        query = query.strip()
+        if has_jamo(query):
+            prefix, keys, key_of = to_chosung(query), self._chosung_keys, to_chosung
+        else:
+            prefix, keys, key_of = normalize_name(query), self._keys, normalize_name
+
+        seen: set = set()
+        results = []
+        owned = self._owned.get(owner) if owner is not None else None
+        if owned:
+            # 본인 이름은 많지 않으므로 직접 걸러서 먼저 보여준다.
+            results = sorted(name for name in owned if key_of(name).startswith(prefix))
+            results = results[:limit]
+            seen.update(results)
+        if len(results) < limit:
+            results += _scan(keys, prefix, limit - len(results), seen)
+        return results
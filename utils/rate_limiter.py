@@ -0,0 +1,115 @@
+import asyncio
+import enum
+import heapq
+import itertools
+import time
+from typing import Mapping, Optional
+
+from utils.logger_config import logger
+
+logger = logger.getChild("utils.rate_limiter")
+
+
+class Priority(enum.IntEnum):
+    """값이 작을수록 먼저 처리된다."""
+
+    INTERACTIVE = 0  # 슬래시 커맨드 등 사용자가 기다리는 요청
+    BACKGROUND = 10  # 캐시 갱신, 주기적 동기화 등
+
+
+def _int_header(headers: Mapping[str, str], name: str) -> Optional[int]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return int(float(value))
+    except ValueError:
+        return None
+
+
+class RateLimitScheduler:
+    """
+    API 키의 분당 요청 한도를 지키기 위한 중앙 스케줄러.
+    토큰 버킷으로 요청 속도를 조절하고, 응답의 X-RateLimit-* 헤더로 버킷을 보정한다.
+    슬롯이 없으면 호출자는 실패하지 않고 우선순위 큐에서 순서를 기다린다.
+    같은 키를 여러 프로세스가 나눠 쓰면 share로 한도 중 이 프로세스 몫(0~1)을 준다.
+    """
+
+    def __init__(self, limit: int, period: float = 60.0, share: float = 1.0):
+        self.period = period
+        self.share = share
+        self.capacity = 0.0
+        self.rate = 0.0
+        self._set_limit(limit)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters: list = []
+        self._seq = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def _set_limit(self, limit: int):
+        # 몫이 작아도 요청을 아예 못 보내지는 않게 최소 1개는 남긴다.
+        self.capacity = max(1.0, limit * self.share)
+        self.rate = self.capacity / self.period
+
+    async def acquire(self, priority: Priority = Priority.INTERACTIVE):
+        """요청 슬롯 하나를 얻을 때까지 기다린다."""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self):
+        while self._waiters:
+            self._refill()
+            now = time.monotonic()
+            if now < self._blocked_until:
+                wait = self._blocked_until - now
+            elif self.tokens < 1:
+                wait = (1 - self.tokens) / self.rate
+            else:
+                _, _, future = heapq.heappop(self._waiters)
+                if future.done():  # 기다리다 취소된 호출자
+                    continue
+                self.tokens -= 1
+                future.set_result(None)
+                continue
+            await asyncio.sleep(wait)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """응답 헤더의 한도/잔여량/리셋 시각으로 버킷을 서버 상태에 맞춘다."""
+        limit = _int_header(headers, "X-RateLimit-Limit")
+        remaining = _int_header(headers, "X-RateLimit-Remaining")
+        reset = _int_header(headers, "X-RateLimit-Reset")
+
+        self._refill()
+        if limit:
+            self._set_limit(limit)
+        if remaining is not None:
+            self.tokens = min(self.tokens, float(remaining))
+            if remaining <= 0 and reset is not None:
+                self._block_for(reset - time.time())
+
+    def penalize(self, retry_after: float):
+        """429 응답을 받으면 retry_after 초 동안 모든 요청을 멈춘다."""
+        logger.warning(f"Rate limited by API, pausing requests for {retry_after}s")
+        self._refill()
+        self.tokens = 0.0
+        self._block_for(retry_after)
+
+    def _block_for(self, seconds: float):
+        until = time.monotonic() + max(0.0, seconds)
+        self._blocked_until = max(self._blocked_until, until)
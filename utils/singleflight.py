@@ -0,0 +1,31 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    같은 key로 동시에 들어온 비동기 작업을 하나로 합친다.
+    처음 호출한 쪽이 작업을 시작하고, 나머지 호출자는 같은 결과(예외 포함)를 기다린다.
+    작업이 끝나면 key가 비워지므로 결과를 캐시하지는 않는다.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        # 한 호출자가 취소되어도 다른 호출자가 기다리는 작업은 계속 진행한다.
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # 모든 호출자가 취소된 경우 "never retrieved" 경고 방지